@@ -0,0 +1,110 @@
+"""
+Command line entry points.
+
+Usage:
+    python -m app.cli rebuild-index [--reset] [--batch-pages N] [--batch-delay SECONDS]
+    python -m app.cli ingest DIR [--workers N] [--no-recursive]
+
+Both commands write to the vector index. With the default embedded index
+(CHROMA_DIR) the API server must be stopped first: an embedded index only
+serves queries from writes made by its own process, so the commands refuse
+to run while a server that has written to it is running (and the server's
+writes fail while a command runs). Set CHROMA_HOST to run them against a
+shared Chroma server while the API keeps serving.
+"""
+import argparse
+import logging
+import sys
+
+from .db.database import engine, Base
+from .db import models  # noqa: F401 - registers the tables with Base.metadata
+
+
+def rebuild_index_command(args: argparse.Namespace) -> None:
+    from .services.index_rebuild import rebuild_index
+
+    def report(state):
+        print(
+            f"pages={state['pages']} chunks_checked={state['chunks_checked']} "
+            f"chunks_embedded={state['chunks_embedded']} chunks_updated={state['chunks_updated']} "
+            f"chunks_deleted={state['chunks_deleted']} last_page_id={state['last_page_id']}"
+        )
+
+    state = rebuild_index(
+        reset=args.reset, batch_pages=args.batch_pages, on_progress=report, batch_delay=args.batch_delay
+    )
+    print(
+        f"Rebuild complete: {state['chunks_embedded']} of {state['chunks_checked']} chunks re-embedded, "
+        f"{state['chunks_updated']} updated, {state['chunks_deleted']} stale chunks deleted"
+    )
+
+
+def ingest_command(args: argparse.Namespace) -> None:
+    from .services.bulk_ingest import ingest_directory
+
+    def report(result):
+        if result["status"] == "failed":
+            print(f"FAILED  {result['path']}: {result['error']}")
+        else:
+            print(
+                f"{result['status']:<9}{result['path']} -> document {result['document_id']} "
+                f"({result.get('pages', 0)} pages, {result.get('chunks', 0)} chunks)"
+            )
+
+    summary = ingest_directory(args.directory, workers=args.workers, recursive=args.recursive, on_result=report)
+    print(
+        f"\n{summary['files']} files in {summary['elapsed_seconds']:.1f}s: "
+        f"{summary['ingested']} ingested, {summary['skipped']} skipped, {summary['failed']} failed"
+    )
+    print(
+        f"{summary['files_per_second']:.2f} files/s, {summary['pages_per_second']:.1f} pages/s, "
+        f"{summary['chunks_per_second']:.1f} chunks/s"
+    )
+    if summary["failures"]:
+        print("\nFailures:")
+        for failure in summary["failures"]:
+            print(f"  {failure['path']}: {failure['error']}")
+        sys.exit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser(
+        "rebuild-index",
+        help="Re-chunk stored pages and re-embed chunks that are missing or changed, resuming from the last checkpoint"
+    )
+    rebuild.add_argument("--reset", action="store_true", help="Ignore the checkpoint and start from the first page")
+    rebuild.add_argument("--batch-pages", type=int, default=None, help="Pages per batch")
+    rebuild.add_argument("--batch-delay", type=float, default=0.0, help="Seconds to pause between batches")
+    rebuild.set_defaults(func=rebuild_index_command)
+
+    ingest = subparsers.add_parser(
+        "ingest",
+        help="Ingest every supported file in a local directory, skipping content already ingested"
+    )
+    ingest.add_argument("directory", help="Directory to ingest")
+    ingest.add_argument("--workers", type=int, default=None, help="Files processed concurrently")
+    ingest.add_argument("--no-recursive", dest="recursive", action="store_false", help="Skip subdirectories")
+    ingest.set_defaults(func=ingest_command)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    from .db.migrations import ensure_schema
+    ensure_schema(engine)
+    from .services.lexical_index import ensure_lexical_index
+    ensure_lexical_index(engine)
+    from .services.store_lock import VectorStoreLockedError
+    from .services.vector_store import lock_for_writes
+    try:
+        lock_for_writes(exclusive=True)
+        args.func(args)
+    except VectorStoreLockedError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,9 @@ class Settings(BaseSettings):
     # File storage settings
     UPLOAD_DIR: Path = Path("data/uploads")
     PROCESSED_DIR: Path = Path("data/processed")
+    MAX_UPLOAD_SIZE: int = 500 * 1024 * 1024  # bytes
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes read per chunk while streaming uploads
+    UPLOAD_FORM_OVERHEAD: int = 1024 * 1024  # bytes allowed per file on top of MAX_UPLOAD_SIZE for multipart framing
     
     # Database settings
     DATABASE_URL: str = os.getenv('DATABASE_URL')
@@ -18,12 +21,93 @@ class Settings(BaseSettings):
     # OCR settings
     TESSERACT_CMD: Optional[str] = os.getenv('TESSERACT_CMD')
     
+    # PDF extraction settings
+    PDF_ENGINE: str = "pymupdf"  # pymupdf or pdfplumber
+    PDF_OCR_DPI: int = 200
+    PDF_PARALLEL_MIN_PAGES: int = 8  # smaller PDFs are extracted in-process
+    OCR_WORKERS: int = os.cpu_count() or 1  # processes for page extraction and OCR
+    
     # OpenAI API key
     OPENAI_API_KEY: str = ""
     
     # Gemini API key
     GEMINI_API_KEY: str = os.getenv('GEMINI_API_KEY')
     
+    # LLM settings
+    LLM_BACKEND: str = "gemini"  # gemini, or stub for offline benchmarks and load tests
+    LLM_MODEL: str = "gemini-2.0-flash"
+    LLM_STUB_DELAY: float = 0.0  # seconds each stub generation takes
+    LLM_CONCURRENCY: int = 16  # concurrent async Gemini calls per worker process
+    
+    # Thread pool for blocking I/O (database, vector store, embeddings) called from async routes
+    IO_WORKERS: int = 32
+    
+    # Embedding / vector store settings
+    EMBEDDING_BACKEND: str = "gemini"  # gemini or hashing (offline, no network)
+    EMBEDDING_MODEL: str = "embedding-001"  # Gemini embedding model
+    EMBEDDING_DIM: int = 768  # dimension of hashing embeddings
+    EMBEDDING_BATCH_SIZE: int = 100  # texts per embed_content call (Gemini caps batches at 100)
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # embedding batches in flight at once
+    VECTOR_WRITE_BATCH_SIZE: int = 5000  # max rows per collection write
+    CHUNK_MAX_TOKENS: int = 500  # tiktoken tokens per chunk
+    CHUNK_OVERLAP_TOKENS: int = 50  # tokens of trailing text repeated at the start of the next chunk
+    CHROMA_DIR: Path = Path("data/chroma")  # persistent vector index location
+    # An embedded index only serves writes made by its own process, so the API server is its
+    # single writer: run one uvicorn worker, or set CHROMA_HOST to share a Chroma server
+    # between several API workers and the CLI
+    CHROMA_HOST: Optional[str] = None
+    CHROMA_PORT: int = 8000
+    INDEX_REBUILD_BATCH_PAGES: int = 200  # pages checked per rebuild step
+    INDEX_REBUILD_CHECKPOINT: Path = Path("data/index_rebuild.json")
+    REBUILD_INDEX_ON_STARTUP: bool = False  # re-embed missing or stale chunks in the background at startup
+    INDEX_REBUILD_BATCH_DELAY: float = 0.5  # seconds to pause between rebuild batches, so queries keep priority
+    INDEX_RETIRE_DELAY: float = 30.0  # seconds a replaced collection is kept after a rebuild swaps in a new one
+    VECTOR_INDEX_REFRESH_SECONDS: float = 5.0  # how often workers sharing CHROMA_HOST re-check which collection is active
+    
+    # Hybrid search settings
+    HYBRID_RRF_K: int = 60  # reciprocal rank fusion damping constant
+    HYBRID_CANDIDATES: int = 20  # results fetched from each ranking before fusion
+    
+    # Embedding cache settings
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: Path = Path("data/embedding_cache.db")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200000
+    
+    # Question answering settings
+    QA_CONTEXT_MODE: str = "retrieval"  # retrieval: pages behind the top-k chunks; full: entire corpus (tiny deployments only)
+    QA_NEIGHBOR_PAGES: int = 1  # pages on either side of each retrieved chunk's page to include
+    QA_CONTEXT_TOKEN_BUDGET: int = 8000  # max tokens of document context per prompt
+    QA_PIPELINE_THEMES: bool = True  # synthesize themes from retrieved chunks concurrently with the answer
+    QA_ANSWER_TIMEOUT: float = 60.0  # seconds; the request fails if the answer call exceeds it
+    QA_THEME_TIMEOUT: float = 20.0  # seconds; slower theme calls degrade to an answer-only response
+    TOKENIZER_ENCODING: str = "cl100k_base"  # tiktoken encoding used for token counts
+    
+    # Query / answer cache settings
+    QUERY_CACHE_ENABLED: bool = True
+    QUERY_CACHE_TTL: float = 300.0  # seconds
+    QUERY_CACHE_MAX_ENTRIES: int = 1024
+    
+    # Ingestion job queue settings
+    INGESTION_WORKERS: int = 2
+    INGESTION_MAX_QUEUE_DEPTH: int = 100
+    INGESTION_POLL_INTERVAL: float = 2.0  # seconds between checks for jobs queued by other processes
+    INGESTION_HEARTBEAT_INTERVAL: float = 10.0  # seconds between lease renewals of running jobs
+    INGESTION_LEASE_SECONDS: float = 60.0  # running jobs not renewed for this long are requeued
+    BULK_INGEST_WORKERS: int = 4  # files processed concurrently by `python -m app.cli ingest`
+    UPLOAD_BATCH_MAX_FILES: int = 100  # files accepted by one POST /upload/batch
+    UPLOAD_BATCH_MAX_BYTES: int = 1024 * 1024 * 1024  # total request body size of one POST /upload/batch
+    
+    # Document listing settings
+    DOCUMENTS_PAGE_SIZE: int = 100  # default documents per /documents page
+    DOCUMENTS_MAX_PAGE_SIZE: int = 1000
+    
+    # Metrics settings
+    METRICS_ENABLED: bool = True  # expose GET /metrics in the Prometheus text format
+    SERVER_TIMING_ENABLED: bool = True  # add per-stage Server-Timing headers to responses
+    
+    # Response compression settings
+    GZIP_MIN_SIZE: int = 1024  # bytes; smaller responses are sent uncompressed
+    
     class Config:
         case_sensitive = True
         env_file = ".env"
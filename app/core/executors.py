@@ -0,0 +1,44 @@
+from typing import Any, Callable, Optional, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import contextvars
+import threading
+from .config import settings
+
+T = TypeVar("T")
+
+_blocking_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_blocking_pool() -> ThreadPoolExecutor:
+    """Thread pool for blocking I/O (SQLAlchemy, Chroma, embedding calls) from async routes."""
+    global _blocking_pool
+    if _blocking_pool is None:
+        with _pool_lock:
+            if _blocking_pool is None:
+                _blocking_pool = ThreadPoolExecutor(
+                    max_workers=settings.IO_WORKERS,
+                    thread_name_prefix="blocking-io"
+                )
+    return _blocking_pool
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking function on the I/O pool without stalling the event loop.
+
+    The caller's context variables (such as the request's stage timings) are
+    visible to the function.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_blocking_pool(), partial(context.run, fn, *args, **kwargs))
+
+
+def shutdown_blocking_pool() -> None:
+    global _blocking_pool
+    if _blocking_pool is not None:
+        _blocking_pool.shutdown(wait=False)
+        _blocking_pool = None
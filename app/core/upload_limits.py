@@ -0,0 +1,88 @@
+from typing import Dict
+import json
+
+
+class _BodyTooLarge(Exception):
+    """Raised from receive() once a request body passes its limit."""
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware that caps the request body size of upload endpoints.
+
+    Starlette spools a multipart upload to a temporary file before the
+    endpoint runs, so a size check in the endpoint only happens after the
+    whole file has been received and written. This middleware rejects a
+    request whose Content-Length is over the limit before reading any of
+    it, and stops reading a chunked or mislabelled body as soon as it passes
+    the limit, answering 413 in both cases. The endpoint still checks each
+    file's exact size while saving it (see save_upload).
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        """
+        Args:
+            app: Wrapped ASGI application
+            limits: Maximum request body size in bytes, keyed by request path
+        """
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # Whatever the app answers after the body was cut off is replaced by the 413
+            if exceeded:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            pass
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not response_started:
+            await self._reject(send, limit)
+
+    @staticmethod
+    async def _reject(send, limit: int) -> None:
+        body = json.dumps({"detail": f"Request body exceeds maximum upload size of {limit} bytes"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,44 @@
+from typing import Dict, List, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from .database import engine
+
+# Columns added to tables after they were first created: {table: [(column, DDL type)]}.
+# create_all only creates missing tables, so existing databases get these via ALTER TABLE.
+ADDED_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "documents": [
+        ("content_hash", "VARCHAR(64)"),
+        ("alias_of_id", "INTEGER REFERENCES documents (id)"),
+        ("status", "VARCHAR NOT NULL DEFAULT 'ready'"),
+    ],
+    "ingestion_jobs": [
+        ("claimed_by", "VARCHAR"),
+        ("heartbeat_at", "TIMESTAMP"),
+    ],
+}
+
+# Indexes on added columns, named as create_all names them
+ADDED_INDEXES: List[str] = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_documents_content_hash ON documents (content_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_documents_alias_of_id ON documents (alias_of_id)",
+]
+
+
+def ensure_schema(bind: Engine = engine) -> None:
+    """
+    Bring tables created by an earlier version up to date with the models.
+
+    Adds any missing columns from ADDED_COLUMNS and their indexes. Safe to run
+    on every startup, after create_all, on SQLite and Postgres.
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            if not inspector.has_table(table):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, ddl in columns:
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+        for statement in ADDED_INDEXES:
+            conn.execute(text(statement))
@@ -11,6 +11,9 @@ class Document(Base):
     file_type = Column(String)  # pdf, image, text
     original_path = Column(String)
     processed_path = Column(String)
+    content_hash = Column(String(64), unique=True, index=True, nullable=True)  # SHA-256 of the original file
+    alias_of_id = Column(Integer, ForeignKey("documents.id"), nullable=True, index=True)  # set on cheap duplicate aliases
+    status = Column(String, nullable=False, default="ready", server_default="ready")  # processing or ready
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -40,4 +43,23 @@ class Paragraph(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
-    page = relationship("Page", back_populates="paragraphs") 
\ No newline at end of file
+    page = relationship("Page", back_populates="paragraphs")
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String)
+    file_path = Column(String)
+    content_hash = Column(String(64), index=True, nullable=True)
+    status = Column(String, index=True, default="queued")  # queued, running, completed, failed
+    priority = Column(Integer, default=0, index=True)  # higher runs first, FIFO within a priority
+    stage = Column(String)
+    progress = Column(Text)  # JSON: {stage: {"done": n, "total": m}}
+    error = Column(Text)
+    document_id = Column(Integer, nullable=True)
+    claimed_by = Column(String, nullable=True)  # worker holding the job while it runs
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed by that worker; stale means the lease expired
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
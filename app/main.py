@@ -1,21 +1,33 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from typing import List
 import os
 from datetime import datetime
 import json
 
-from .routers import documents, search, qa
+from .routers import documents, search, qa, jobs, metrics, index
 from .core.config import settings
+from .core.executors import shutdown_blocking_pool
+from .core.responses import FastJSONResponse
+from .core.metrics import MetricsMiddleware
+from .core.upload_limits import UploadSizeLimitMiddleware
 from .db.database import engine, Base
+from .services.ingestion_queue import ingestion_queue
+from .db.migrations import ensure_schema
+from .services.lexical_index import ensure_lexical_index
+from .services.index_rebuild import background_rebuild
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+ensure_schema(engine)
+ensure_lexical_index(engine)
 
 app = FastAPI(
     title="Document Processing API",
     description="API for document processing with OCR capabilities",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Configure CORS
@@ -25,12 +37,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Compress responses for clients that accept gzip; precompressed snapshots pass through
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MIN_SIZE)
+
+# Reject oversized uploads before Starlette spools them to disk
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        f"{settings.API_V1_STR}/upload": settings.MAX_UPLOAD_SIZE + settings.UPLOAD_FORM_OVERHEAD,
+        f"{settings.API_V1_STR}/upload/batch": settings.UPLOAD_BATCH_MAX_BYTES,
+    },
+)
+
+# Request latency metrics and Server-Timing headers; outermost, so it times everything
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(documents.router, prefix="/api/v1", tags=["documents"])
 app.include_router(search.router, prefix="/api/v1", tags=["search"])
 app.include_router(qa.router, prefix="/api/v1", tags=["qa"])
+app.include_router(jobs.router, prefix="/api/v1", tags=["jobs"])
+app.include_router(index.router, prefix="/api/v1", tags=["index"])
+app.include_router(metrics.router, tags=["metrics"])
+
+@app.on_event("startup")
+async def start_ingestion_workers():
+    ingestion_queue.start()
+
+@app.on_event("startup")
+async def rebuild_vector_index():
+    # The persistent collection is already loaded; optionally re-embed anything missing or stale
+    if settings.REBUILD_INDEX_ON_STARTUP:
+        background_rebuild.start()
+
+@app.on_event("shutdown")
+async def stop_ingestion_workers():
+    ingestion_queue.stop()
+    background_rebuild.stop(timeout=5)
+    shutdown_blocking_pool()
 
 @app.get("/")
 async def root():
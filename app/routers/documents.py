@@ -1,113 +1,396 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, load_only
+from typing import Any, Dict, List, Optional, Set, Tuple
+import base64
+import binascii
 import os
-import aiofiles
 from datetime import datetime
 import shutil
 
 from ..db.database import get_db
-from ..services.document_processor import DocumentProcessor
+from ..services.document_processor import DocumentProcessor, SUPPORTED_FILE_TYPES
+from ..services.ingestion_queue import ingestion_queue, QueueFullError
+from ..services.upload_storage import save_upload, UploadTooLargeError
 from ..core.config import settings
-from ..services.vector_store import collection
+from ..core.executors import run_blocking
+from ..services.vector_store import clear_collection, delete_document_chunks
+from ..services import lexical_index
+from ..services.query_cache import bump_corpus_version
+from ..services.search_filters import to_utc
+from ..services.snapshots import build_document_payload, write_snapshot, delete_snapshot, find_snapshot, read_snapshot
 
 router = APIRouter()
 
-@router.post("/upload")
-async def upload_document(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
-    """Upload and process a document."""
+async def _accept_upload(file: UploadFile, priority: int, alias: bool, db: Session) -> Tuple[int, Dict[str, Any]]:
+    """
+    Store one uploaded file and queue it, short-circuiting duplicates.
+    
+    Returns:
+        (status_code, body); errors are raised as HTTPException
+    """
     # Validate file type
-    allowed_types = ['pdf', 'jpg', 'jpeg', 'png', 'txt']
     file_type = file.filename.split('.')[-1].lower()
-    if file_type not in allowed_types:
+    if file_type not in SUPPORTED_FILE_TYPES:
         raise HTTPException(
             status_code=400,
-            detail=f"File type not allowed. Allowed types: {', '.join(allowed_types)}"
+            detail=f"File type not allowed. Allowed types: {', '.join(SUPPORTED_FILE_TYPES)}"
         )
     
+    # Reject early instead of storing a file we cannot queue
+    try:
+        await run_blocking(ingestion_queue.check_capacity, db)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    
     # Create unique filename
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{timestamp}_{file.filename}"
     file_path = settings.UPLOAD_DIR / filename
+    suffix = 1
+    while file_path.exists():
+        # Same name uploaded within the same second
+        filename = f"{timestamp}_{suffix}_{file.filename}"
+        file_path = settings.UPLOAD_DIR / filename
+        suffix += 1
     
-    # Save uploaded file
+    # Stream uploaded file to disk
     try:
-        async with aiofiles.open(file_path, 'wb') as out_file:
-            content = await file.read()
-            await out_file.write(content)
+        content_hash, size = await save_upload(
+            file, file_path, settings.MAX_UPLOAD_SIZE, settings.UPLOAD_CHUNK_SIZE
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error saving file: {str(e)}"
         )
     
-    # Process document
-    try:
-        processor = DocumentProcessor(db)
-        document = await processor.process_document(str(file_path), filename)
-        return {
-            "message": "Document processed successfully",
-            "document_id": document.id,
-            "filename": document.filename
+    # Short-circuit duplicates of queued or processed documents. Pending jobs
+    # are checked first: a document still being processed is not ready yet.
+    pending = await run_blocking(ingestion_queue.find_pending, db, content_hash)
+    if pending:
+        os.remove(file_path)
+        return 202, {
+            "message": "Document already queued for processing",
+            "job_id": pending.id,
+            "status_url": f"{settings.API_V1_STR}/jobs/{pending.id}",
+            "filename": pending.filename,
+            "sha256": content_hash,
+            "duplicate": True
         }
-    except Exception as e:
-        # Clean up file if processing fails
+    
+    processor = DocumentProcessor(db)
+    existing = await run_blocking(processor.find_by_hash, content_hash)
+    if existing:
+        os.remove(file_path)
+        content = {
+            "message": "Document already processed",
+            "document_id": existing.id,
+            "filename": existing.filename,
+            "sha256": content_hash,
+            "duplicate": True
+        }
+        if alias:
+            content["alias_id"] = (await run_blocking(processor.create_alias, existing, filename)).id
+        return 200, content
+    
+    # Queue document for processing
+    try:
+        job = await run_blocking(ingestion_queue.enqueue, db, filename, str(file_path), priority, content_hash)
+    except QueueFullError as e:
         if os.path.exists(file_path):
             os.remove(file_path)
         raise HTTPException(
-            status_code=500,
-            detail=f"Error processing document: {str(e)}"
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": "30"}
+        )
+    
+    return 202, {
+        "message": "Document queued for processing",
+        "job_id": job.id,
+        "status_url": f"{settings.API_V1_STR}/jobs/{job.id}",
+        "filename": filename,
+        "sha256": content_hash,
+        "size": size
+    }
+
+@router.post("/upload", status_code=202)
+async def upload_document(
+    file: UploadFile = File(...),
+    priority: int = 0,
+    alias: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Upload a document and queue it for background processing.
+    
+    Uploads whose content was already processed are not processed again; the
+    existing document id is returned, and with alias=true a lightweight alias
+    document is recorded under the new filename.
+    """
+    status_code, content = await _accept_upload(file, priority, alias, db)
+    return JSONResponse(status_code=status_code, content=content)
+
+@router.post("/upload/batch", status_code=202)
+async def upload_documents(
+    files: List[UploadFile] = File(...),
+    priority: int = 0,
+    alias: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Upload several documents in one request and queue each for processing.
+    
+    Every file is handled as by POST /upload; a file that is rejected (bad
+    type, too large, queue full) does not fail the others. Results are
+    returned in upload order with the status code each file would have had.
+    The request as a whole is limited to UPLOAD_BATCH_MAX_BYTES.
+    """
+    if len(files) > settings.UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many files: {len(files)}. At most {settings.UPLOAD_BATCH_MAX_FILES} files per batch"
         )
+    
+    results = []
+    for file in files:
+        try:
+            status_code, content = await _accept_upload(file, priority, alias, db)
+        except HTTPException as e:
+            status_code, content = e.status_code, {"filename": file.filename, "detail": e.detail}
+        results.append({"status_code": status_code, **content})
+    
+    return {
+        "queued": sum(1 for r in results if r["status_code"] == 202 and not r.get("duplicate")),
+        "duplicates": sum(1 for r in results if r.get("duplicate")),
+        "failed": sum(1 for r in results if r["status_code"] >= 400),
+        "results": results
+    }
+
+def _encode_cursor(document_id: int) -> str:
+    return base64.urlsafe_b64encode(str(document_id).encode()).decode()
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/documents")
-async def list_documents(db: Session = Depends(get_db)):
-    """List all processed documents."""
+def list_documents(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    order: str = "asc",
+    file_type: Optional[str] = None,
+    filename: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    include_aliases: bool = True,
+    db: Session = Depends(get_db)
+):
+    """
+    List processed documents, one page at a time.
+    
+    Documents are ordered by id and paginated by keyset: when more documents
+    match, the X-Next-Cursor response header holds the cursor for the next
+    page. The body stays a plain list of documents.
+    
+    Args:
+        limit: Documents per page (default: settings.DOCUMENTS_PAGE_SIZE)
+        cursor: X-Next-Cursor value from the previous page
+        order: "asc" (oldest first) or "desc" (newest first)
+        file_type: Only documents of this file type
+        filename: Only documents whose filename contains this text
+        created_from: Only documents created at or after this time
+        created_to: Only documents created before this time
+        include_aliases: Include alias documents recorded for duplicate uploads
+    """
     from ..db.models import Document
-    documents = db.query(Document).all()
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Invalid order. Allowed values: asc, desc")
+    limit = min(limit or settings.DOCUMENTS_PAGE_SIZE, settings.DOCUMENTS_MAX_PAGE_SIZE)
+    
+    query = db.query(Document)
+    if cursor:
+        last_id = _decode_cursor(cursor)
+        query = query.filter(Document.id > last_id if order == "asc" else Document.id < last_id)
+    if file_type:
+        query = query.filter(Document.file_type == file_type.lower())
+    if filename:
+        query = query.filter(Document.filename.contains(filename, autoescape=True))
+    # created_at is stored as naive UTC
+    created_from, created_to = to_utc(created_from), to_utc(created_to)
+    if created_from:
+        query = query.filter(Document.created_at >= created_from)
+    if created_to:
+        query = query.filter(Document.created_at < created_to)
+    if not include_aliases:
+        query = query.filter(Document.alias_of_id.is_(None))
+    # Documents still being ingested have no pages yet
+    query = query.filter(Document.status == "ready")
+    
+    # Fetch one extra row to know whether another page follows
+    documents = (
+        query.order_by(Document.id if order == "asc" else Document.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    if len(documents) > limit:
+        documents = documents[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(documents[-1].id)
+    
     return [
         {
             "id": doc.id,
             "filename": doc.filename,
             "file_type": doc.file_type,
+            "alias_of": doc.alias_of_id,
             "created_at": doc.created_at.isoformat()
         }
         for doc in documents
     ]
 
+DOCUMENT_FIELDS = ("id", "filename", "file_type", "alias_of", "created_at", "page_count", "pages", "content", "paragraphs")
+
+def _parse_fields(fields: Optional[str]) -> Set[str]:
+    if not fields:
+        return set(DOCUMENT_FIELDS)
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - set(DOCUMENT_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed fields: {', '.join(DOCUMENT_FIELDS)}"
+        )
+    return selected
+
+def _parse_page_range(pages: Optional[str]) -> Optional[Tuple[int, Optional[int]]]:
+    """Parse "N", "from-to" or "from-" into an inclusive page range."""
+    if not pages:
+        return None
+    first, sep, last = pages.partition("-")
+    try:
+        start = int(first)
+        end = (int(last) if last else None) if sep else start
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid page range. Use pages=N or pages=from-to")
+    if start < 1 or (end is not None and end < start):
+        raise HTTPException(status_code=400, detail="Invalid page range. Use pages=N or pages=from-to")
+    return start, end
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes are ignored
+    return etag.removeprefix("W/") in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+def _snapshot_response(request: Request, document_id: int) -> Optional[Response]:
+    """Serve a document's precompressed snapshot without touching the database."""
+    snapshot = find_snapshot(document_id, request.headers.get("accept-encoding", ""))
+    if snapshot is None:
+        return None
+    path, content_encoding, etag = snapshot
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return Response(read_snapshot(path, content_encoding), media_type="application/json", headers=headers)
+
 @router.get("/documents/{document_id}")
-async def get_document(document_id: int, db: Session = Depends(get_db)):
-    """Get document details and content."""
-    from ..db.models import Document
+def get_document(
+    document_id: int,
+    request: Request,
+    pages: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get document details and content.
+    
+    Full requests are served from the document's precompressed snapshot,
+    with ETag / If-None-Match revalidation, without querying the database.
+    
+    Args:
+        pages: Page range to return, "N" or "from-to" (default: all pages)
+        fields: Comma-separated fields to return (default: all). "content"
+            and "paragraphs" select the parts of each page; "pages" alone
+            returns page numbers only.
+    """
+    from ..db.models import Document, Page
+    selected = _parse_fields(fields)
+    page_range = _parse_page_range(pages)
+    full = page_range is None and selected == set(DOCUMENT_FIELDS)
+    
+    if full:
+        response = _snapshot_response(request, document_id)
+        if response is not None:
+            return response
+    
     document = db.query(Document).filter(Document.id == document_id).first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    return {
+    if full and document.alias_of_id is None:
+        payload = build_document_payload(db, document)
+        if payload["page_count"]:
+            # Snapshot documents processed before snapshots existed
+            write_snapshot(document.id, payload)
+        return payload
+    
+    # Aliases share the content of the document they duplicate
+    source_id = document.alias_of_id or document.id
+    
+    result = {
         "id": document.id,
         "filename": document.filename,
         "file_type": document.file_type,
-        "created_at": document.created_at.isoformat(),
-        "pages": [
-            {
-                "page_number": page.page_number,
-                "content": page.content,
-                "paragraphs": [
+        "alias_of": document.alias_of_id,
+        "created_at": document.created_at.isoformat()
+    }
+    result = {key: value for key, value in result.items() if key in selected}
+    
+    if "page_count" in selected:
+        result["page_count"] = db.query(func.count(Page.id)).filter(Page.document_id == source_id).scalar()
+    
+    if selected & {"pages", "content", "paragraphs"}:
+        # Requested pages and, if needed, their paragraphs in one query
+        query = db.query(Page).filter(Page.document_id == source_id)
+        if page_range:
+            query = query.filter(Page.page_number >= page_range[0])
+            if page_range[1] is not None:
+                query = query.filter(Page.page_number <= page_range[1])
+        if "content" not in selected:
+            query = query.options(load_only(Page.id, Page.page_number))
+        if "paragraphs" in selected:
+            query = query.options(joinedload(Page.paragraphs))
+        
+        result["pages"] = []
+        for page in query.order_by(Page.page_number).all():
+            page_result = {"page_number": page.page_number}
+            if "content" in selected:
+                page_result["content"] = page.content
+            if "paragraphs" in selected:
+                page_result["paragraphs"] = [
                     {
                         "paragraph_number": p.paragraph_number,
                         "content": p.content
                     }
-                    for p in page.paragraphs
+                    for p in sorted(page.paragraphs, key=lambda p: p.paragraph_number)
                 ]
-            }
-            for page in document.pages
-        ]
-    }
+            result["pages"].append(page_result)
+    
+    return result
 
 @router.delete("/clear-all")
-async def clear_all_documents(db: Session = Depends(get_db)):
+def clear_all_documents(db: Session = Depends(get_db)):
     """
     Clear all documents from the database, vector store, and file system.
     This will delete:
@@ -117,16 +400,17 @@ async def clear_all_documents(db: Session = Depends(get_db)):
     """
     try:
         # Clear vector store
-        collection.delete(
-            where={"$and": [{"doc_id": {"$exists": True}}]}
-        )
+        clear_collection()
         
         # Clear database
         from ..db.models import Document, Page, Paragraph
+        lexical_index.clear_index(db)
         db.query(Paragraph).delete()
         db.query(Page).delete()
+        db.query(Document).filter(Document.alias_of_id.isnot(None)).delete()
         db.query(Document).delete()
         db.commit()
+        bump_corpus_version()
         
         # Clear file system
         if os.path.exists(settings.UPLOAD_DIR):
@@ -142,7 +426,7 @@ async def clear_all_documents(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/documents/{document_id}")
-async def delete_document(document_id: int, db: Session = Depends(get_db)):
+def delete_document(document_id: int, db: Session = Depends(get_db)):
     """
     Delete a specific document from the database, vector store, and file system.
     """
@@ -155,17 +439,18 @@ async def delete_document(document_id: int, db: Session = Depends(get_db)):
     
     try:
         # Delete from vector store
-        collection.delete(
-            where={"doc_id": str(document_id)}
-        )
+        delete_document_chunks(str(document_id))
         
         # Delete from database
+        lexical_index.delete_document(db, document_id)
         db.query(Paragraph).filter(Paragraph.page_id.in_(
             db.query(Page.id).filter(Page.document_id == document_id)
         )).delete(synchronize_session=False)
         db.query(Page).filter(Page.document_id == document_id).delete()
+        db.query(Document).filter(Document.alias_of_id == document_id).delete()
         db.query(Document).filter(Document.id == document_id).delete()
         db.commit()
+        bump_corpus_version()
         
         # Delete files
         file_path = settings.UPLOAD_DIR / document.filename
@@ -175,6 +460,7 @@ async def delete_document(document_id: int, db: Session = Depends(get_db)):
         processed_dir = settings.PROCESSED_DIR / str(document_id)
         if os.path.exists(processed_dir):
             shutil.rmtree(processed_dir)
+        delete_snapshot(document_id)
         
         return {"message": f"Document {document_id} deleted successfully"}
     except Exception as e:
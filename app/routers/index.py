@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from typing import Dict, Any
+
+from ..services.index_rebuild import background_rebuild
+
+router = APIRouter()
+
+@router.post("/index/rebuild", response_model=Dict[str, Any], status_code=202)
+def start_index_rebuild(reset: bool = False):
+    """
+    Re-chunk stored pages in the background and re-embed only the chunks that changed.
+
+    Run after changing chunking or embedding settings; the index keeps
+    serving queries meanwhile. Set reset to ignore the checkpoint of an
+    interrupted rebuild and start from the first page.
+    """
+    if not background_rebuild.start(reset=reset):
+        raise HTTPException(status_code=409, detail="An index rebuild is already running")
+    return JSONResponse(status_code=202, content=background_rebuild.status())
+
+@router.get("/index/rebuild", response_model=Dict[str, Any])
+def get_index_rebuild():
+    """Get the status and progress of the current or last index rebuild."""
+    return background_rebuild.status()
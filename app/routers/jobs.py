@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Dict, Any
+
+from ..db.database import get_db
+from ..db.models import IngestionJob
+from ..services.ingestion_queue import job_to_dict
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}", response_model=Dict[str, Any])
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """Get the status and per-stage progress of an ingestion job."""
+    job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
@@ -1,49 +1,85 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any
-from ..services.qa_service import answer_question
+import json
+import logging
+from ..services.qa_service import answer_question, stream_answer_question
+from ..services.search_filters import SearchFilters
+from .search import search_filters
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 @router.get("/ask", response_model=List[Dict[str, str]])
-async def ask_question(question: str, k: int = 5):
+async def ask_question(question: str, k: int = 5, filters: SearchFilters = Depends(search_filters)):
     """
     Ask a question about the documents and get an answer with citations and theme analysis.
     
     Args:
         question: The question to ask
         k: Number of chunks to retrieve (default: 5)
+        filters: doc_ids, file_type, created_from and created_to; only matching
+            documents are searched and loaded as context
     
     Returns:
-        List of dictionaries containing the answer, citations, and themes in table format:
-        [
-            {
-                "doc_id": "Answer",
-                "content": "The answer text",
-                "page": "",
-                "paragraph": ""
-            },
-            {
-                "doc_id": "1",
-                "content": "Cited text",
-                "page": "1",
-                "paragraph": "1"
-            },
-            {
-                "doc_id": "Theme 1",
-                "content": "Theme summary",
-                "page": "",
-                "paragraph": ""
-            },
-            {
-                "doc_id": "1",
-                "content": "Supporting evidence",
-                "page": "2",
-                "paragraph": "3"
-            },
-            ...
-        ]
+        List of table rows, each {"doc_id", "content", "page", "paragraph"}, in order:
+        
+        - the answer: {"doc_id": "Answer", "content": "The answer text", "page": "", "paragraph": ""}
+        - if the answer cites sources, one row per retrieved chunk, whose
+          paragraph is the range it spans: {"doc_id": "1", "content": "Chunk text", "page": "1", "paragraph": "1-3"}
+        - then one row per paragraph the answer cites, with its text:
+          {"doc_id": "1", "content": "Cited paragraph", "page": "1", "paragraph": "2"}
+        - for each theme, a theme row followed by a row per paragraph it cites:
+          {"doc_id": "Theme 1: Name", "content": "Theme summary", "page": "", "paragraph": ""},
+          {"doc_id": "1", "content": "Cited paragraph", "page": "2", "paragraph": "3"}
+        
+        Citations that do not resolve to a stored paragraph are left out.
+        Theme rows are omitted if theme synthesis times out or fails. With
+        no (matching) documents, only an "Answer" row saying so is returned.
     """
     try:
-        return await answer_question(question, k)
+        return await answer_question(question, k, filters)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/ask/stream")
+async def ask_question_stream(request: Request, question: str, k: int = 5,
+                              filters: SearchFilters = Depends(search_filters)):
+    """
+    Ask a question and stream the result as Server-Sent Events.
+    
+    Accepts the same filters as /ask.
+    
+    Each event is "event: <name>" followed by "data: <JSON>". Events, in order:
+        answer: a JSON string with the next fragment of answer text
+        citations: the answer, chunk and cited paragraph rows, as returned by /ask
+        themes: the theme rows and their cited paragraph rows, as returned by /ask
+        error: {"detail": "..."} if processing fails
+        done: {} once everything has been sent
+    
+    The rows of citations followed by those of themes are the table /ask returns.
+    
+    Disconnecting cancels the upstream generation.
+    """
+    async def events():
+        stream = stream_answer_question(question, k, filters)
+        try:
+            async for event, data in stream:
+                if await request.is_disconnected():
+                    break
+                yield _sse(event, data)
+        except Exception as e:
+            logger.exception("Streaming answer failed")
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            await stream.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
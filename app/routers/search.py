@@ -1,29 +1,71 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
-from ..services.vector_store import search_similar_chunks, store_document_chunks, split_text_into_chunks
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+from ..services.vector_store import store_document_chunks, split_text_into_chunks
+from ..services.hybrid_search import search, SEARCH_MODES
+from ..services.document_processor import SUPPORTED_FILE_TYPES
+from ..services.search_filters import SearchFilters, build_search_filters
+from ..core.executors import run_blocking
 
 router = APIRouter()
 
+async def search_filters(
+    doc_ids: Optional[List[int]] = Query(None),
+    file_type: Optional[List[str]] = Query(None),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> SearchFilters:
+    """
+    Query parameters that scope a search or question to a subset of documents.
+    
+    Args:
+        doc_ids: Only these documents (repeat the parameter for several)
+        file_type: Only documents of these file types (repeatable)
+        created_from: Only documents created at or after this time
+        created_to: Only documents created before this time
+    """
+    for value in file_type or []:
+        if value.lower() not in SUPPORTED_FILE_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type. Allowed types: {', '.join(SUPPORTED_FILE_TYPES)}"
+            )
+    if created_from and created_to and created_from >= created_to:
+        raise HTTPException(status_code=400, detail="created_from must be before created_to")
+    if not doc_ids:
+        return build_search_filters(None, file_type, created_from, created_to)
+    return await run_blocking(build_search_filters, doc_ids, file_type, created_from, created_to)
+
 @router.get("/search", response_model=List[Dict[str, Any]])
-async def semantic_search(query: str, k: int = 5):
+async def semantic_search(query: str, k: int = 5, mode: str = "vector",
+                          filters: SearchFilters = Depends(search_filters)):
     """
-    Perform semantic search on document chunks.
+    Perform semantic, lexical or hybrid search on document content.
     
     Args:
         query: The search query
         k: Number of results to return (default: 5)
+        mode: "vector" (default), "lexical" (full-text only, no embedding call)
+            or "hybrid" (reciprocal rank fusion of both)
+        filters: doc_ids, file_type, created_from and created_to, applied
+            inside the vector and full-text queries
     
     Returns:
-        List of similar chunks with their metadata and similarity scores
+        List of matching chunks or paragraphs with their metadata and scores
     """
+    if mode not in SEARCH_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid search mode. Allowed modes: {', '.join(SEARCH_MODES)}"
+        )
     try:
-        results = search_similar_chunks(query, k)
+        results = await run_blocking(search, query, k, mode, filters)
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/test/setup")
-async def setup_test_data():
+def setup_test_data():
     """
     Add some test documents to the vector store.
     """
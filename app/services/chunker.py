@@ -0,0 +1,180 @@
+from typing import Callable, Deque, Iterator, List, NamedTuple, Optional
+from collections import deque
+from dataclasses import dataclass
+import re
+from ..core.config import settings
+from .context_packer import count_tokens_uncached
+
+# Bump when the chunking algorithm changes, so re-indexing can tell which chunks are stale
+CHUNKER_VERSION = "2"
+
+PARAGRAPH_SEPARATOR = "\n\n"
+
+# A sentence ends at terminal punctuation (plus closing quotes or brackets) followed by whitespace
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+_WORD = re.compile(r"\S+\s*")
+
+# No tokenizer produces fewer tokens than characters / this, so longer text is
+# known to be oversized without being encoded (BPE is slow on huge unbroken runs)
+_MAX_CHARS_PER_TOKEN = 16
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A chunk of page text and where it came from."""
+    text: str
+    char_start: int  # offset of text in the page, inclusive
+    char_end: int  # offset of text in the page, exclusive
+    para_start: int  # first paragraph covered, numbered as DocumentProcessor numbers them
+    para_end: int  # last paragraph covered
+    tokens: int
+
+
+class _Unit(NamedTuple):
+    """The smallest piece of text the packer works with: a paragraph, sentence, word or hard split."""
+    start: int
+    end: int
+    tokens: int
+    paragraph: int
+
+
+def _oversized(text: str, start: int, end: int, max_tokens: int,
+               count: Callable[[str], int]) -> Optional[int]:
+    """Return the token count of text[start:end], or None if it is over max_tokens."""
+    if end - start > max_tokens * _MAX_CHARS_PER_TOKEN:
+        return None
+    tokens = count(text[start:end])
+    return tokens if tokens <= max_tokens else None
+
+
+def _hard_split(text: str, start: int, end: int, paragraph: int, max_tokens: int,
+                count: Callable[[str], int]) -> Iterator[_Unit]:
+    """Split a run with no usable boundaries into windows of at most max_tokens."""
+    window = max(1, max_tokens * 4)
+    while start < end:
+        size = min(window, end - start)
+        while True:
+            tokens = count(text[start:start + size])
+            if tokens <= max_tokens or size == 1:
+                break
+            size = max(1, size // 2)
+        yield _Unit(start, start + size, tokens, paragraph)
+        start += size
+
+
+def _split_words(text: str, start: int, end: int, paragraph: int, max_tokens: int,
+                 count: Callable[[str], int]) -> Iterator[_Unit]:
+    for match in _WORD.finditer(text, start, end):
+        tokens = _oversized(text, match.start(), match.end(), max_tokens, count)
+        if tokens is None:
+            yield from _hard_split(text, match.start(), match.end(), paragraph, max_tokens, count)
+        else:
+            yield _Unit(match.start(), match.end(), tokens, paragraph)
+
+
+def _split_sentences(text: str, start: int, end: int, paragraph: int, max_tokens: int,
+                     count: Callable[[str], int]) -> Iterator[_Unit]:
+    boundaries = [match.end() for match in _SENTENCE_END.finditer(text, start, end)]
+    if not boundaries or boundaries[-1] != end:
+        boundaries.append(end)
+    for sentence_end in boundaries:
+        if text[start:sentence_end].strip():
+            tokens = _oversized(text, start, sentence_end, max_tokens, count)
+            if tokens is None:
+                yield from _split_words(text, start, sentence_end, paragraph, max_tokens, count)
+            else:
+                yield _Unit(start, sentence_end, tokens, paragraph)
+        start = sentence_end
+
+
+def _units(text: str, max_tokens: int, count: Callable[[str], int]) -> Iterator[_Unit]:
+    """
+    Yield the text as units of at most max_tokens, in order.
+
+    Paragraphs are kept whole when they fit; larger ones are split at
+    sentence boundaries, then word boundaries, then hard limits. Each unit
+    includes the whitespace that follows it, so units tile the text.
+    """
+    paragraph = 0
+    start = 0
+    while True:
+        paragraph += 1
+        separator = text.find(PARAGRAPH_SEPARATOR, start)
+        end = len(text) if separator == -1 else separator + len(PARAGRAPH_SEPARATOR)
+        if text[start:end].strip():
+            tokens = _oversized(text, start, end, max_tokens, count)
+            if tokens is None:
+                yield from _split_sentences(text, start, end, paragraph, max_tokens, count)
+            else:
+                yield _Unit(start, end, tokens, paragraph)
+        if separator == -1:
+            return
+        start = end
+
+
+def _make_chunk(text: str, window: Deque[_Unit], tokens: int) -> Chunk:
+    start, end = window[0].start, window[-1].end
+    piece = text[start:end]
+    stripped = piece.strip()
+    start += len(piece) - len(piece.lstrip())
+    return Chunk(
+        text=stripped,
+        char_start=start,
+        char_end=start + len(stripped),
+        para_start=window[0].paragraph,
+        para_end=window[-1].paragraph,
+        tokens=tokens
+    )
+
+
+def chunker_version() -> str:
+    """Identify the chunking algorithm and the settings that shape its chunks."""
+    return f"{CHUNKER_VERSION}:{settings.TOKENIZER_ENCODING}:{settings.CHUNK_MAX_TOKENS}:{settings.CHUNK_OVERLAP_TOKENS}"
+
+
+def iter_chunks(text: str, max_tokens: Optional[int] = None,
+                overlap_tokens: Optional[int] = None) -> Iterator[Chunk]:
+    """
+    Split page text into chunks of at most max_tokens tiktoken tokens.
+
+    Runs in time linear in the length of the text: every unit is encoded
+    once and packed greedily, and overlap reuses the trailing units of the
+    previous chunk without re-encoding them. Chunk token counts are the sum
+    of their units' counts, which can differ from encoding the joined text
+    by a token at unit boundaries.
+
+    Args:
+        text: Page text; paragraphs are separated by blank lines
+        max_tokens: Maximum tokens per chunk (default: settings.CHUNK_MAX_TOKENS)
+        overlap_tokens: Tokens of trailing context repeated at the start of the
+            next chunk (default: settings.CHUNK_OVERLAP_TOKENS)
+
+    Yields:
+        Chunks in order, with character offsets into text
+    """
+    max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+    overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    overlap_tokens = min(overlap_tokens, max_tokens - 1)
+
+    window: Deque[_Unit] = deque()
+    tokens = 0
+    # True once the window holds a unit that has not been emitted yet
+    pending = False
+    for unit in _units(text, max_tokens, count_tokens_uncached):
+        if pending and tokens + unit.tokens > max_tokens:
+            yield _make_chunk(text, window, tokens)
+            pending = False
+            # Keep the trailing units that fit in the overlap and leave room for this unit
+            while window and (tokens > overlap_tokens or tokens + unit.tokens > max_tokens):
+                tokens -= window.popleft().tokens
+        window.append(unit)
+        tokens += unit.tokens
+        pending = True
+    if pending:
+        yield _make_chunk(text, window, tokens)
+
+
+def chunk_text(text: str, max_tokens: Optional[int] = None,
+               overlap_tokens: Optional[int] = None) -> List[Chunk]:
+    """Return every chunk of text; see iter_chunks."""
+    return list(iter_chunks(text, max_tokens, overlap_tokens))
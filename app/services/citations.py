@@ -0,0 +1,89 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import re
+from sqlalchemy import tuple_
+from ..db.database import SessionLocal
+from ..db.models import Page, Paragraph
+from .search_filters import SearchFilters
+
+# A (doc_id, page, paragraph) citation key
+CitationKey = Tuple[str, int, int]
+
+CITATION_RE = re.compile(
+    r"\[\s*Doc ID:\s*([^,\]]+?)\s*,\s*Page:\s*(\d+)\s*,\s*Paragraph:\s*(\d+)(?:\s*-\s*(\d+))?\s*\]",
+    re.IGNORECASE
+)
+
+# Upper bound on the paragraphs a single range citation expands to
+MAX_RANGE_PARAGRAPHS = 50
+
+
+def parse_citations(text: str) -> List[CitationKey]:
+    """
+    Parse [Doc ID: X, Page: Y, Paragraph: Z] citations out of LLM output.
+
+    Paragraph ranges ("Paragraph: 3-5", as labelled on retrieved chunks) are
+    expanded to their individual paragraphs.
+
+    Returns:
+        Citation keys in order of first appearance, without duplicates
+    """
+    keys: Dict[CitationKey, None] = {}
+    for match in CITATION_RE.finditer(text):
+        doc_id, page, first, last = match.groups()
+        first = int(first)
+        last = int(last) if last else first
+        last = min(max(first, last), first + MAX_RANGE_PARAGRAPHS - 1)
+        for paragraph in range(first, last + 1):
+            keys[(doc_id.strip(), int(page), paragraph)] = None
+    return list(keys)
+
+
+def build_paragraph_index(pages: List[Dict[str, Any]]) -> Dict[CitationKey, str]:
+    """Index the paragraphs of page content dictionaries by citation key."""
+    return {
+        (str(page["doc_id"]), int(page["page"]), int(para["paragraph_number"])): para["content"]
+        for page in pages
+        for para in page["paragraphs"]
+    }
+
+
+def _lookup_paragraphs(keys: Iterable[CitationKey], filters: Optional[SearchFilters] = None) -> Dict[CitationKey, str]:
+    """Fetch paragraph text for citation keys with one batched query, within filters if given."""
+    keys = [(int(doc_id), page, paragraph) for doc_id, page, paragraph in keys if doc_id.isdigit()]
+    if not keys:
+        return {}
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Page.document_id, Page.page_number, Paragraph.paragraph_number, Paragraph.content)
+            .join(Paragraph, Paragraph.page_id == Page.id)
+            .filter(tuple_(Page.document_id, Page.page_number, Paragraph.paragraph_number).in_(keys))
+            .filter(*(filters or SearchFilters()).document_conditions(Page.document_id))
+            .all()
+        )
+        return {(str(doc_id), page, paragraph): content for doc_id, page, paragraph, content in rows}
+    finally:
+        db.close()
+
+
+def resolve_citations(
+    keys: List[CitationKey],
+    paragraph_index: Optional[Dict[CitationKey, str]] = None,
+    filters: Optional[SearchFilters] = None
+) -> List[Tuple[CitationKey, Optional[str]]]:
+    """
+    Resolve citation keys to paragraph text.
+
+    Keys are looked up in paragraph_index first; the rest are fetched from
+    the database in a single query, restricted to documents matching
+    filters so a scoped question never cites text from outside its scope.
+
+    Returns:
+        (key, text) pairs in the order of keys; text is None if the
+        paragraph does not exist
+    """
+    paragraph_index = paragraph_index or {}
+    missing = [key for key in keys if key not in paragraph_index]
+    found = _lookup_paragraphs(missing, filters) if missing else {}
+    return [(key, paragraph_index.get(key, found.get(key))) for key in keys]
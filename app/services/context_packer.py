@@ -0,0 +1,187 @@
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
+import logging
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# A section truncated to fit the budget is only worth including with at least this many tokens
+MIN_TRUNCATED_TOKENS = 32
+
+
+@dataclass
+class PackedContext:
+    """Prompt context plus the token accounting behind it."""
+    text: str
+    tokens_used: int
+    tokens_dropped: int
+    sections_used: int
+    sections_dropped: int
+    duplicates_removed: int
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+    except Exception:
+        # tiktoken missing or its encoding file unavailable offline
+        logger.warning("tiktoken unavailable, falling back to approximate token counts")
+        return None
+
+
+@lru_cache(maxsize=65536)
+def count_tokens(text: str) -> int:
+    """Count tokens in text, caching the result per distinct string."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens_uncached(text: str) -> int:
+    """Count tokens without caching, for one-off or very large strings such as prompts and page text."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Return the longest prefix of text that is at most max_tokens tokens."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def _relevance_ordered_sections(
+    chunks: List[Dict[str, Any]], pages: List[Dict[str, Any]]
+) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Order context sections by relevance.
+
+    For each retrieved chunk (best first) the paragraphs it contains come
+    first, then the remaining paragraphs of its page; pages that were only
+    fetched as neighbours follow. Chunks whose page is not in the database
+    are included as-is. Paragraphs the chunk overlaps carry the chunk text
+    as a shorter fallback for when the whole paragraph does not fit.
+    """
+    pages_by_key = {(str(page["doc_id"]), int(page["page"])): page for page in pages}
+    sections: List[Tuple[str, str, Optional[str]]] = []  # (citation, content, fallback)
+    seen_pages = set()
+
+    def add_page(key: Tuple[str, int], chunk: Optional[Dict[str, Any]]) -> None:
+        page = pages_by_key[key]
+        paragraphs = page["paragraphs"]
+        in_chunk = lambda p: False
+        if chunk is not None:
+            # Paragraphs covered by the chunk before the rest of the page
+            metadata = chunk["metadata"]
+            if "para_start" in metadata:
+                start, end = int(metadata["para_start"]), int(metadata["para_end"])
+                in_chunk = lambda p: start <= p["paragraph_number"] <= end
+            else:
+                in_chunk = lambda p: p["content"] in chunk["text"] or chunk["text"] in p["content"]
+            paragraphs = sorted(paragraphs, key=lambda p: not in_chunk(p))
+        for para in paragraphs:
+            citation = f"[Doc ID: {key[0]}, Page: {key[1]}, Paragraph: {para['paragraph_number']}]"
+            sections.append((citation, para["content"], chunk["text"] if in_chunk(para) else None))
+        seen_pages.add(key)
+
+    for chunk in chunks:
+        metadata = chunk["metadata"]
+        key = (str(metadata["doc_id"]), int(metadata["page"]))
+        if key in seen_pages:
+            continue
+        if key in pages_by_key:
+            add_page(key, chunk)
+        else:
+            citation = f"[Doc ID: {key[0]}, Page: {key[1]}, Chunk: {metadata.get('chunk_num', 0)}]"
+            sections.append((citation, chunk["text"], None))
+
+    for page in pages:
+        key = (str(page["doc_id"]), int(page["page"]))
+        if key not in seen_pages:
+            add_page(key, None)
+
+    return sections
+
+
+def pack_context(chunks: List[Dict[str, Any]], pages: List[Dict[str, Any]],
+                 token_budget: Optional[int] = None) -> PackedContext:
+    """
+    Pack retrieved chunks and page paragraphs into a token-budgeted context.
+
+    Each paragraph is included at most once, duplicate text is dropped, and
+    sections are added in relevance order until the budget is full. A
+    paragraph that does not fit is replaced by the retrieved chunk it
+    contains, if that is shorter, or else truncated to the remaining budget;
+    sections that still do not fit are skipped so smaller, less relevant ones
+    can still be used. A page that is one very long paragraph therefore still
+    contributes its best-matching chunk.
+
+    Args:
+        chunks: Chunks returned by search_similar_chunks, best first
+        pages: Page content dictionaries from qa_service
+        token_budget: Maximum context tokens (default: settings.QA_CONTEXT_TOKEN_BUDGET)
+
+    Returns:
+        PackedContext with the context text and token accounting
+    """
+    token_budget = token_budget or settings.QA_CONTEXT_TOKEN_BUDGET
+    header = "Here are the relevant document passages, most relevant first:\n\n"
+
+    used = count_tokens(header)
+    dropped = 0
+    duplicates = 0
+    sections_dropped = 0
+    seen_text = set()
+    included = []
+
+    for citation, content, fallback in _relevance_ordered_sections(chunks, pages):
+        normalized = _normalize(content)
+        if not normalized or normalized in seen_text:
+            duplicates += 1
+            continue
+        seen_text.add(normalized)
+
+        section = f"{citation}: {content}"
+        tokens = count_tokens(section) + 1  # separator
+        if used + tokens > token_budget:
+            full_tokens = tokens
+            if fallback and len(fallback) < len(content) and _normalize(fallback) not in seen_text:
+                seen_text.add(_normalize(fallback))
+                content = fallback
+                section = f"{citation}: {content}"
+                tokens = count_tokens_uncached(section) + 1
+            remaining = token_budget - used - count_tokens(f"{citation}: ") - 1
+            if used + tokens > token_budget and remaining >= MIN_TRUNCATED_TOKENS:
+                # Re-tokenizing at the joins can add a token or two
+                section = f"{citation}: {truncate_to_tokens(content, remaining - 2)}"
+                tokens = count_tokens_uncached(section) + 1
+            if used + tokens > token_budget:
+                dropped += full_tokens
+                sections_dropped += 1
+                continue
+            dropped += full_tokens - tokens
+        included.append(section)
+        used += tokens
+
+    if not included:
+        return PackedContext("No documents available.", 0, dropped, 0, sections_dropped, duplicates)
+
+    return PackedContext(
+        text=header + "\n\n".join(included),
+        tokens_used=used,
+        tokens_dropped=dropped,
+        sections_used=len(included),
+        sections_dropped=sections_dropped,
+        duplicates_removed=duplicates
+    )
@@ -1,15 +1,25 @@
 import os
+import hashlib
 import pytesseract
-from pdf2image import convert_from_path
-import pdfplumber
 from PIL import Image
-from typing import List, Dict, Any
-import json
+from typing import List, Dict, Any, Callable, Optional
 from datetime import datetime
 from ..core.config import settings
+from ..core.metrics import stage, INGESTED_TOTAL
 from ..db.models import Document, Page, Paragraph
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from .vector_store import store_document_chunks, split_text_into_chunks
+from sqlalchemy.exc import IntegrityError
+from .chunker import chunk_text
+from .vector_store import store_document_pages, delete_document_chunks
+from .search_filters import document_metadata
+from .pdf_engine import extract_pdf_pages
+from . import lexical_index
+from .query_cache import bump_corpus_version
+from .snapshots import build_document_payload, write_snapshot, delete_snapshot
+
+# File extensions DocumentProcessor can extract text from
+SUPPORTED_FILE_TYPES = ('pdf', 'jpg', 'jpeg', 'png', 'txt')
 
 class DocumentProcessor:
     def __init__(self, db: Session):
@@ -17,59 +27,198 @@ class DocumentProcessor:
         if settings.TESSERACT_CMD:
             pytesseract.pytesseract.tesseract_cmd = settings.TESSERACT_CMD
 
-    async def process_document(self, file_path: str, filename: str) -> Document:
-        """Process a document and extract text using OCR if needed."""
+    async def process_document(
+        self,
+        file_path: str,
+        filename: str,
+        on_progress: Optional[Callable[[str, int, int], None]] = None,
+        content_hash: Optional[str] = None
+    ) -> Document:
+        """
+        Process a document and extract text using OCR if needed.
+        
+        If a document with the same content hash was already processed, it is
+        returned as-is without re-running OCR or embeddings. The document is
+        created with status "processing" and only becomes "ready", and visible
+        to duplicate detection, once its pages and chunks are stored; a
+        processing row left behind by a worker that died (whose job was
+        requeued) is discarded and rebuilt.
+        
+        Args:
+            file_path: Path of the uploaded file
+            filename: Stored filename
+            on_progress: Optional callback invoked as on_progress(stage, done, total)
+                for the "extract", "persist" and "embed" stages
+            content_hash: SHA-256 of the file, computed from file_path if omitted
+        """
+        report = on_progress or (lambda stage, done, total: None)
         file_type = self._get_file_type(filename)
+        content_hash = content_hash or self._hash_file(file_path)
+        
+        existing = self.find_by_hash(content_hash)
+        if existing:
+            return existing
+        
+        abandoned = (
+            self.db.query(Document)
+            .filter(Document.content_hash == content_hash, Document.status == "processing")
+            .first()
+        )
+        if abandoned:
+            self._discard(abandoned)
         
         # Create document record
         document = Document(
             filename=filename,
             file_type=file_type,
             original_path=file_path,
-            processed_path=str(settings.PROCESSED_DIR / f"{filename}.json")
+            content_hash=content_hash,
+            status="processing"
         )
         self.db.add(document)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # An identical upload was committed concurrently
+            self.db.rollback()
+            existing = self.find_by_hash(content_hash)
+            if existing is None:
+                raise Exception("An identical document is already being processed")
+            return existing
+        
+        try:
+            self._ingest(document, file_path, file_type, report)
+        except Exception:
+            # Do not leave a half-processed document claiming this content hash
+            self._discard(document)
+            raise
+        
+        document.status = "ready"
         self.db.commit()
         
+        # Save the precompressed snapshot served to viewers
+        self._save_snapshot(document)
+        bump_corpus_version()
+        
+        return document
+
+    def _ingest(self, document: Document, file_path: str, file_type: str,
+                report: Callable[[str, int, int], None]) -> None:
+        """Extract pages, persist pages and paragraphs, and index chunks."""
         # Process based on file type
+        report("extract", 0, 1)
         if file_type == 'pdf':
-            pages = self._process_pdf(file_path)
+            with stage("pdf_extract"):
+                pages = self._process_pdf(file_path)
         elif file_type in ['jpg', 'jpeg', 'png']:
-            pages = self._process_image(file_path)
+            with stage("ocr"):
+                pages = self._process_image(file_path)
         else:
-            pages = self._process_text(file_path)
-        
-        # Save pages and paragraphs
-        for page_num, page_content in enumerate(pages, 1):
-            page = Page(
-                document_id=document.id,
-                page_number=page_num,
-                content=page_content
-            )
-            self.db.add(page)
-            self.db.commit()
-            
-            # Split into paragraphs and save
-            paragraphs = page_content.split('\n\n')
-            for para_num, para_content in enumerate(paragraphs, 1):
-                if para_content.strip():
-                    paragraph = Paragraph(
-                        page_id=page.id,
-                        paragraph_number=para_num,
-                        content=para_content.strip()
-                    )
-                    self.db.add(paragraph)
-            
-            # Store in vector database
-            chunks = split_text_into_chunks(page_content)
-            store_document_chunks(str(document.id), page_num, chunks)
-            
-        self.db.commit()
+            with stage("text_extract"):
+                pages = self._process_text(file_path)
+        report("extract", 1, 1)
         
-        # Save processed data to JSON
-        self._save_to_json(document)
+        # Save pages and paragraphs in a single transaction
+        report("persist", 0, len(pages))
+        with stage("persist"):
+            self._persist_pages(document, pages)
+        report("persist", len(pages), len(pages))
         
-        return document
+        # Collect chunks for a single bulk write to the vector database
+        with stage("chunk"):
+            page_chunks = [
+                (page_num, chunk_text(page_content))
+                for page_num, page_content in enumerate(pages, 1)
+            ]
+        
+        # Store in vector database
+        chunk_count = sum(len(chunks) for _, chunks in page_chunks)
+        report("embed", 0, chunk_count)
+        with stage("embed_and_store"):
+            store_document_pages(str(document.id), page_chunks, document_metadata(document))
+        report("embed", chunk_count, chunk_count)
+        
+        INGESTED_TOTAL.inc(len(pages), unit="pages")
+        INGESTED_TOTAL.inc(chunk_count, unit="chunks")
+
+    def _persist_pages(self, document: Document, pages: List[str]) -> None:
+        """
+        Bulk insert the pages and paragraphs of a document and commit once.
+        
+        Page ids come back from a single multi-row INSERT ... RETURNING, and
+        paragraphs are written with one executemany instead of per-row ORM adds.
+        """
+        if not pages:
+            return
+        
+        page_ids = self.db.scalars(
+            insert(Page).returning(Page.id, sort_by_parameter_order=True),
+            [
+                {
+                    "document_id": document.id,
+                    "page_number": page_num,
+                    "content": page_content
+                }
+                for page_num, page_content in enumerate(pages, 1)
+            ]
+        ).all()
+        
+        # Split into paragraphs and save
+        paragraph_rows = [
+            {
+                "page_id": page_id,
+                "paragraph_number": para_num,
+                "content": para_content.strip()
+            }
+            for page_id, page_content in zip(page_ids, pages)
+            for para_num, para_content in enumerate(page_content.split('\n\n'), 1)
+            if para_content.strip()
+        ]
+        if paragraph_rows:
+            self.db.execute(insert(Paragraph), paragraph_rows)
+        
+        # Keep the full-text index in the same transaction
+        lexical_index.index_document(self.db, document.id)
+        self.db.commit()
+        INGESTED_TOTAL.inc(len(paragraph_rows), unit="paragraphs")
+
+    def _discard(self, document: Document) -> None:
+        """Remove a partially processed document from the database and vector store."""
+        self.db.rollback()
+        delete_document_chunks(str(document.id))
+        lexical_index.delete_document(self.db, document.id)
+        delete_snapshot(document.id)
+        self.db.delete(document)
+        self.db.commit()
+
+    def find_by_hash(self, content_hash: str) -> Optional[Document]:
+        """Return the processed document with the given content hash, if any."""
+        return (
+            self.db.query(Document)
+            .filter(Document.content_hash == content_hash, Document.status == "ready")
+            .first()
+        )
+
+    def create_alias(self, document: Document, filename: str) -> Document:
+        """Record a duplicate upload as a cheap alias of an existing document."""
+        alias = Document(
+            filename=filename,
+            file_type=document.file_type,
+            original_path=document.original_path,
+            processed_path=document.processed_path,
+            alias_of_id=document.id
+        )
+        self.db.add(alias)
+        self.db.commit()
+        return alias
+
+    def _hash_file(self, file_path: str) -> str:
+        """Compute the SHA-256 of a file in fixed-size chunks."""
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(settings.UPLOAD_CHUNK_SIZE), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
 
     def _get_file_type(self, filename: str) -> str:
         """Get file type from filename."""
@@ -77,23 +226,10 @@ class DocumentProcessor:
 
     def _process_pdf(self, file_path: str) -> List[str]:
         """Process PDF file and extract text."""
-        pages = []
         try:
-            # First try to extract text directly
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        pages.append(text)
-                    else:
-                        # If no text found, use OCR
-                        images = convert_from_path(file_path, first_page=page.page_number, last_page=page.page_number)
-                        for image in images:
-                            text = pytesseract.image_to_string(image)
-                            pages.append(text)
+            return extract_pdf_pages(file_path)
         except Exception as e:
             raise Exception(f"Error processing PDF: {str(e)}")
-        return pages
 
     def _process_image(self, file_path: str) -> List[str]:
         """Process image file using OCR."""
@@ -113,29 +249,8 @@ class DocumentProcessor:
         except Exception as e:
             raise Exception(f"Error processing text file: {str(e)}")
 
-    def _save_to_json(self, document: Document) -> None:
-        """Save processed document data to JSON file."""
-        data = {
-            "document_id": document.id,
-            "filename": document.filename,
-            "file_type": document.file_type,
-            "created_at": document.created_at.isoformat(),
-            "pages": []
-        }
-        
-        for page in document.pages:
-            page_data = {
-                "page_number": page.page_number,
-                "content": page.content,
-                "paragraphs": [
-                    {
-                        "paragraph_number": p.paragraph_number,
-                        "content": p.content
-                    }
-                    for p in page.paragraphs
-                ]
-            }
-            data["pages"].append(page_data)
-        
-        with open(document.processed_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2) 
\ No newline at end of file
+    def _save_snapshot(self, document: Document) -> None:
+        """Save the processed document as a compact, precompressed snapshot served by get_document."""
+        path = write_snapshot(document.id, build_document_payload(self.db, document))
+        document.processed_path = str(path)
+        self.db.commit() 
\ No newline at end of file
@@ -0,0 +1,144 @@
+from typing import Dict, List, Optional
+from abc import ABC, abstractmethod
+import re
+import threading
+import zlib
+import google.generativeai as genai
+import numpy as np
+from ..core.config import settings
+from .llm import configure_gemini
+
+
+class Embedder(ABC):
+    """
+    Interface for embedding backends.
+
+    name identifies the model and its parameters; it is part of embedding
+    cache keys, so two embedders must only share a name if they produce the
+    same vectors.
+    """
+
+    name: str = "embedder"
+
+    @abstractmethod
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of document texts."""
+
+    @abstractmethod
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query."""
+
+
+class GeminiEmbedder(Embedder):
+    """Embeddings from the Gemini embedding API."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.name = f"gemini:{model}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        configure_gemini()
+        result = genai.embed_content(
+            model=self.model,
+            content=texts,
+            task_type="retrieval_document"
+        )
+        return result["embedding"]
+
+    def embed_query(self, text: str) -> List[float]:
+        configure_gemini()
+        result = genai.embed_content(
+            model=self.model,
+            content=text,
+            task_type="retrieval_query"
+        )
+        return result["embedding"]
+
+
+class HashingEmbedder(Embedder):
+    """
+    Local feature-hashing embeddings that need no network.
+
+    Lower-cased word unigrams and bigrams are hashed (CRC32, stable across
+    processes) into a signed vector of the given dimension, which is then
+    L2-normalized. A whole batch is built with a single vectorized np.add.at.
+    Quality is far below a learned model; it exists for offline CI, load
+    tests and throughput benchmarks that should exclude provider latency.
+    """
+
+    _token_re = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.name = f"hashing:{dim}"
+
+    def _features(self, text: str) -> List[int]:
+        tokens = self._token_re.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return [zlib.crc32(feature.encode("utf-8")) for feature in features]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [self._features(text) for text in texts]
+        rows = np.repeat(np.arange(len(texts)), [len(h) for h in hashes])
+        flat = np.fromiter((value for h in hashes for value in h), dtype=np.uint64, count=len(rows))
+
+        columns = (flat % self.dim).astype(np.int64)
+        signs = np.where((flat >> np.uint64(31)) & np.uint64(1), -1.0, 1.0)
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (rows, columns), signs)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        return matrix.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+EMBEDDER_BACKENDS = ("gemini", "hashing")
+
+_embedder: Optional[Embedder] = None
+_embedder_lock = threading.Lock()
+
+
+def create_embedder(backend: str) -> Embedder:
+    """Create an embedder for the named backend."""
+    if backend == "gemini":
+        return GeminiEmbedder(settings.EMBEDDING_MODEL)
+    if backend == "hashing":
+        return HashingEmbedder(settings.EMBEDDING_DIM)
+    raise ValueError(f"Unknown embedding backend: {backend}. Allowed backends: {', '.join(EMBEDDER_BACKENDS)}")
+
+
+_named_embedders: Dict[str, Embedder] = {}
+
+
+def embedder_from_name(name: str) -> Embedder:
+    """
+    Return an embedder that produces the vectors an Embedder.name identifies.
+
+    Used to keep querying a vector collection with the embedder that built
+    it after settings.EMBEDDING_BACKEND changes, until a rebuild replaces it.
+    """
+    if name == get_embedder().name:
+        return get_embedder()
+    with _embedder_lock:
+        if name not in _named_embedders:
+            backend, _, parameter = name.partition(":")
+            if backend == "gemini":
+                _named_embedders[name] = GeminiEmbedder(parameter)
+            elif backend == "hashing":
+                _named_embedders[name] = HashingEmbedder(int(parameter))
+            else:
+                raise ValueError(f"Unknown embedder: {name}")
+        return _named_embedders[name]
+
+
+def get_embedder() -> Embedder:
+    """Return the embedder selected by settings.EMBEDDING_BACKEND."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = create_embedder(settings.EMBEDDING_BACKEND)
+    return _embedder
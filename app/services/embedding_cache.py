@@ -0,0 +1,149 @@
+from typing import List, Dict, Optional
+from array import array
+from pathlib import Path
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from ..core.config import settings
+
+# Stored as PRAGMA user_version; bump when the blob format changes
+CACHE_FORMAT_VERSION = 2
+# Embeddings are stored as float32, which is all the embedding models return
+EMBEDDING_TYPECODE = "f"
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different copies share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_key(model: str, task_type: str, text: str) -> str:
+    """Content-address an embedding by model, task type and normalized text."""
+    payload = "\x00".join([model, task_type, normalize_text(text)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache backed by SQLite.
+
+    SQLite's file locking (in WAL mode) makes the cache safe to share between
+    several uvicorn workers; each thread gets its own connection. Entries are
+    evicted least-recently-used once the cache grows past max_entries.
+    Vectors are stored as float32 blobs; a cache written in an older format
+    is emptied when opened.
+    """
+
+    def __init__(self, path: Path, max_entries: int):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_access ON embeddings (last_access)"
+        )
+        if conn.execute("PRAGMA user_version").fetchone()[0] != CACHE_FORMAT_VERSION:
+            # Blobs from version 1 are float64 and would decode as garbage
+            conn.execute("DELETE FROM embeddings")
+            conn.execute(f"PRAGMA user_version = {CACHE_FORMAT_VERSION}")
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return cached embeddings for the given keys, skipping misses."""
+        if not keys:
+            return {}
+
+        conn = self._connect()
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(unique_keys), 500):
+            batch = unique_keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})",
+                batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array(EMBEDDING_TYPECODE, blob).tolist()
+
+        if found:
+            now = time.time()
+            conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+            conn.commit()
+
+        hits = sum(1 for key in keys if key in found)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        """Store embeddings and evict the least recently used overflow."""
+        if not items:
+            return
+
+        conn = self._connect()
+        now = time.time()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, embedding, last_access) VALUES (?, ?, ?)",
+            [(key, array(EMBEDDING_TYPECODE, embedding).tobytes(), now) for key, embedding in items.items()]
+        )
+        conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters for this process."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the shared embedding cache, or None when caching is disabled."""
+    global _cache
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    settings.EMBEDDING_CACHE_PATH,
+                    settings.EMBEDDING_CACHE_MAX_ENTRIES
+                )
+    return _cache
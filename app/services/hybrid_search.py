@@ -0,0 +1,72 @@
+from typing import List, Dict, Any, Optional, Tuple
+from ..core.config import settings
+from .vector_store import search_similar_chunks
+from .lexical_index import search_paragraphs
+from .search_filters import SearchFilters
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+
+def _fusion_key(result: Dict[str, Any], vector_results: List[Dict[str, Any]]) -> Tuple:
+    """Key a result so a lexical paragraph and the vector chunk containing it fuse together."""
+    metadata = result["metadata"]
+    for index, chunk in enumerate(vector_results):
+        chunk_meta = chunk["metadata"]
+        if (str(chunk_meta["doc_id"]) == str(metadata["doc_id"])
+                and int(chunk_meta["page"]) == int(metadata["page"])
+                and result["text"] in chunk["text"]):
+            return ("chunk", index)
+    return ("paragraph", str(metadata["doc_id"]), int(metadata["page"]), result["text"])
+
+
+def reciprocal_rank_fusion(vector_results: List[Dict[str, Any]], lexical_results: List[Dict[str, Any]],
+                           k: int, rrf_k: int = None) -> List[Dict[str, Any]]:
+    """
+    Fuse vector and lexical rankings with reciprocal rank fusion.
+
+    Each result scores sum(1 / (rrf_k + rank)) over the rankings it appears in.
+    A lexical paragraph contained in a retrieved chunk counts towards that chunk.
+    """
+    rrf_k = rrf_k or settings.HYBRID_RRF_K
+    fused: Dict[Tuple, Dict[str, Any]] = {}
+
+    for rank, result in enumerate(vector_results, 1):
+        entry = fused.setdefault(("chunk", rank - 1), {**result, "score": 0.0})
+        entry["score"] += 1.0 / (rrf_k + rank)
+
+    for rank, result in enumerate(lexical_results, 1):
+        key = _fusion_key(result, vector_results)
+        entry = fused.setdefault(key, {**result, "score": 0.0})
+        entry["score"] += 1.0 / (rrf_k + rank)
+        if key[0] == "chunk" and "paragraph" not in entry["metadata"]:
+            # Point the chunk at its best lexically matching paragraph
+            entry["metadata"] = {**entry["metadata"], "paragraph": result["metadata"]["paragraph"]}
+
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)[:k]
+
+
+def search(query: str, k: int = 5, mode: str = "vector",
+           filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+    """
+    Search document content.
+
+    Args:
+        query: The search query
+        k: Number of results to return
+        mode: "vector" (embeddings), "lexical" (full-text, no embedding call)
+            or "hybrid" (both, fused with reciprocal rank fusion)
+        filters: Optional restriction to a subset of documents
+
+    Returns:
+        Results with text, metadata and a distance or score
+    """
+    if mode == "lexical":
+        return search_paragraphs(query, k, filters)
+    if mode == "hybrid":
+        candidates = max(k, settings.HYBRID_CANDIDATES)
+        return reciprocal_rank_fusion(
+            search_similar_chunks(query, candidates, filters),
+            search_paragraphs(query, candidates, filters),
+            k
+        )
+    return search_similar_chunks(query, k, filters)
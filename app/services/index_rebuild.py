@@ -0,0 +1,286 @@
+from typing import Any, Callable, Dict, List, Optional
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+import json
+import logging
+import os
+import threading
+import time
+from ..core.config import settings
+from ..core.metrics import stage
+from ..db.database import SessionLocal
+from ..db.models import Document, Page
+from .chunker import chunk_text
+from .query_cache import bump_corpus_version
+from .search_filters import document_metadata
+from .embedders import get_embedder
+from .vector_store import (
+    VectorIndex, lock_for_writes, get_index, begin_index_build, activate_index, abandon_index_build, drop_collection,
+    build_chunk_records, add_chunk_records
+)
+
+logger = logging.getLogger(__name__)
+
+# Metadata that decides whether a stored chunk's embedding is still valid
+EMBEDDING_KEYS = ("content_hash", "embedder_version")
+
+
+def _new_state(collection: str) -> Dict[str, Any]:
+    return {
+        "collection": collection, "last_page_id": 0, "pages": 0, "chunks_checked": 0,
+        "chunks_embedded": 0, "chunks_updated": 0, "chunks_deleted": 0
+    }
+
+
+def _load_checkpoint(path: Path, collection: str) -> Dict[str, Any]:
+    state = _new_state(collection)
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        # Progress only carries over to a rebuild of the same collection
+        if saved.get("collection", collection) == collection:
+            state.update(saved, collection=collection)
+    return state
+
+
+def _save_checkpoint(path: Path, state: Dict[str, int]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _stored_chunks(index: VectorIndex, pages: List[Any]) -> Dict[str, Dict[str, Any]]:
+    """Return the metadata of every indexed chunk of the given pages, keyed by chunk id."""
+    page_numbers = defaultdict(list)
+    for page in pages:
+        page_numbers[str(page.document_id)].append(page.page_number)
+    clauses = [
+        {"$and": [{"doc_id": doc_id}, {"page": {"$in": numbers}}]}
+        for doc_id, numbers in page_numbers.items()
+    ]
+    where = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+    stored = index.collection.get(where=where, include=["metadatas"])
+    return dict(zip(stored["ids"], stored["metadatas"]))
+
+
+def _sync_pages(index: VectorIndex, pages: List[Any]) -> Dict[str, int]:
+    """
+    Bring a collection's chunks of a batch of pages in line with their current chunking.
+
+    Chunks whose text hash or embedder changed, or that are missing, are
+    re-embedded; chunks that only differ in other metadata (paragraph span,
+    chunker version, document metadata) are updated without embedding;
+    chunks left over from a page that now produces fewer chunks are deleted.
+    """
+    ids, documents, metadatas = [], [], []
+    for page in pages:
+        page_ids, page_documents, page_metadatas = build_chunk_records(
+            str(page.document_id),
+            [(page.page_number, chunk_text(page.content or ""))],
+            # The row carries the document's file_type and created_at
+            document_metadata(page),
+            index.embedder.name
+        )
+        ids += page_ids
+        documents += page_documents
+        metadatas += page_metadatas
+
+    stored = _stored_chunks(index, pages)
+    embed, update = [], []
+    for i, chunk_id in enumerate(ids):
+        existing = stored.get(chunk_id)
+        if existing is None or any(existing.get(key) != metadatas[i].get(key) for key in EMBEDDING_KEYS):
+            embed.append(i)
+        elif existing != metadatas[i]:
+            update.append(i)
+    stale = sorted(set(stored) - set(ids))
+
+    if embed:
+        add_chunk_records([ids[i] for i in embed], [documents[i] for i in embed], [metadatas[i] for i in embed], index)
+    if update:
+        index.collection.update(ids=[ids[i] for i in update], metadatas=[metadatas[i] for i in update])
+    if stale:
+        index.collection.delete(ids=stale)
+    if update or stale:
+        bump_corpus_version()
+
+    return {"checked": len(ids), "embedded": len(embed), "updated": len(update), "deleted": len(stale)}
+
+
+def rebuild_index(
+    reset: bool = False,
+    batch_pages: Optional[int] = None,
+    checkpoint_path: Optional[Path] = None,
+    on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+    batch_delay: Optional[float] = None,
+    stop_event: Optional[threading.Event] = None
+) -> Dict[str, int]:
+    """
+    Re-chunk the pages table and re-embed only the chunks that changed.
+
+    Pages are walked in id order in batches and re-chunked with the current
+    settings. Each indexed chunk carries a hash of its text plus the chunker
+    and embedder versions that produced it, so only chunks that are missing
+    or whose hash changed are embedded again; see _sync_pages.
+
+    When the configured embedder is the one the active collection was built
+    with, chunks are updated in place, one batch of upserts at a time with a
+    pause between batches. When the embedder changed, vectors from the two
+    models must not be ranked against each other (and may differ in
+    dimension), so the chunks are embedded into a new collection while the
+    active one keeps serving queries; ingestion writes to both meanwhile.
+    Once every page is done the new collection is swapped in atomically and
+    the old one is dropped after settings.INDEX_RETIRE_DELAY seconds.
+
+    Progress is checkpointed after every batch; an interrupted or stopped
+    rebuild resumes where it left off unless reset is set.
+
+    Args:
+        reset: Ignore any existing checkpoint and start from the first page
+        batch_pages: Pages per batch (default: settings.INDEX_REBUILD_BATCH_PAGES)
+        checkpoint_path: Checkpoint file (default: settings.INDEX_REBUILD_CHECKPOINT)
+        on_progress: Optional callback invoked with the state after each batch
+        batch_delay: Seconds to pause between batches (default: settings.INDEX_REBUILD_BATCH_DELAY)
+        stop_event: Optional event that stops the rebuild after the current batch
+
+    Returns:
+        Final state: collection written, last page id, pages walked and chunks
+        checked, embedded, updated and deleted
+    """
+    batch_pages = batch_pages or settings.INDEX_REBUILD_BATCH_PAGES
+    batch_delay = settings.INDEX_REBUILD_BATCH_DELAY if batch_delay is None else batch_delay
+    checkpoint_path = Path(checkpoint_path or settings.INDEX_REBUILD_CHECKPOINT)
+    stop_event = stop_event or threading.Event()
+
+    lock_for_writes()
+    embedder = get_embedder()
+    index = get_index()
+    rebuilding = index.embedder.name != embedder.name
+    if rebuilding:
+        index = begin_index_build(embedder)
+    else:
+        # A rebuild for an embedder that is no longer configured will never finish
+        abandon_index_build()
+
+    if reset and checkpoint_path.exists():
+        checkpoint_path.unlink()
+    state = _load_checkpoint(checkpoint_path, index.collection.name)
+    start = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        while not stop_event.is_set():
+            pages = (
+                db.query(Page.id, Page.document_id, Page.page_number, Page.content,
+                         Document.file_type, Document.created_at)
+                .join(Document, Document.id == Page.document_id)
+                .filter(Page.id > state["last_page_id"])
+                .order_by(Page.id)
+                .limit(batch_pages)
+                .all()
+            )
+            if not pages:
+                break
+
+            with stage("index_rebuild_batch"):
+                counts = _sync_pages(index, pages)
+
+            state["last_page_id"] = pages[-1].id
+            state["pages"] += len(pages)
+            state["chunks_checked"] += counts["checked"]
+            state["chunks_embedded"] += counts["embedded"]
+            state["chunks_updated"] += counts["updated"]
+            state["chunks_deleted"] += counts["deleted"]
+            _save_checkpoint(checkpoint_path, state)
+            if on_progress:
+                on_progress(dict(state))
+
+            if batch_delay:
+                stop_event.wait(batch_delay)
+    finally:
+        db.close()
+
+    if stop_event.is_set():
+        logger.info("Index rebuild stopped at page id %d", state["last_page_id"])
+        return state
+
+    # A finished rebuild starts from scratch next time
+    if checkpoint_path.exists():
+        checkpoint_path.unlink()
+
+    if rebuilding:
+        previous = activate_index(index)
+        logger.info("Switched queries to %s, embedded with %s", index.collection.name, embedder.name)
+        if previous:
+            # Let queries that already picked the old collection finish
+            stop_event.wait(settings.INDEX_RETIRE_DELAY)
+            drop_collection(previous)
+
+    logger.info(
+        "Index rebuild finished: %d pages, %d chunks checked, %d embedded, %d updated, %d deleted in %.1fs",
+        state["pages"], state["chunks_checked"], state["chunks_embedded"],
+        state["chunks_updated"], state["chunks_deleted"], time.perf_counter() - start
+    )
+    return state
+
+
+class BackgroundRebuild:
+    """Runs rebuild_index in a background thread, one run at a time, and reports its progress."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._status: Dict[str, Any] = {"status": "idle"}
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, reset: bool = False) -> bool:
+        """Start a rebuild unless one is already running; returns whether one was started."""
+        with self._lock:
+            if self.is_running():
+                return False
+            self._stopping.clear()
+            self._status = {
+                "status": "running",
+                "started_at": datetime.utcnow().isoformat(),
+                "finished_at": None,
+                "progress": {},
+                "error": None
+            }
+            self._thread = threading.Thread(target=self._run, args=(reset,), name="index-rebuild", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop a running rebuild after its current batch; it resumes from the checkpoint next time."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._status)
+
+    def _set_progress(self, state: Dict[str, int]) -> None:
+        with self._lock:
+            self._status["progress"] = state
+
+    def _run(self, reset: bool) -> None:
+        try:
+            state = rebuild_index(reset=reset, on_progress=self._set_progress, stop_event=self._stopping)
+            outcome, error = ("stopped" if self._stopping.is_set() else "finished"), None
+        except Exception as e:
+            logger.exception("Index rebuild failed")
+            state, outcome, error = None, "failed", str(e)
+        with self._lock:
+            if state is not None:
+                self._status["progress"] = state
+            self._status.update(status=outcome, error=error, finished_at=datetime.utcnow().isoformat())
+
+
+background_rebuild = BackgroundRebuild()
@@ -0,0 +1,256 @@
+from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..db.database import SessionLocal
+from ..db.models import IngestionJob
+from .document_processor import DocumentProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue is at its maximum depth."""
+
+
+def job_to_dict(job: IngestionJob) -> Dict[str, Any]:
+    """Serialize an ingestion job for the API."""
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "priority": job.priority,
+        "stage": job.stage,
+        "progress": json.loads(job.progress) if job.progress else {},
+        "error": job.error,
+        "document_id": job.document_id,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+class IngestionQueue:
+    """
+    Bounded worker pool that processes persisted ingestion jobs.
+
+    Jobs live in the ingestion_jobs table, so queued work survives a restart.
+    Workers claim the highest-priority, oldest queued job with a conditional
+    UPDATE, which keeps claims safe when several processes share the database.
+
+    A claimed job is leased to this queue: a heartbeat thread renews
+    heartbeat_at for its running jobs, and any running job whose lease has
+    expired (its process died) is requeued, by whichever process notices
+    first. Jobs that live sibling processes are working on are left alone.
+    """
+
+    def __init__(self, workers: int, max_queue_depth: int, poll_interval: float,
+                 heartbeat_interval: float = 10.0, lease_seconds: float = 60.0):
+        self.workers = workers
+        self.max_queue_depth = max_queue_depth
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def check_capacity(self, db: Session) -> None:
+        """Raise QueueFullError when the queue is at its maximum depth."""
+        depth = db.query(IngestionJob).filter(IngestionJob.status == "queued").count()
+        if depth >= self.max_queue_depth:
+            raise QueueFullError(f"Ingestion queue is full ({depth} jobs queued)")
+
+    def enqueue(self, db: Session, filename: str, file_path: str, priority: int = 0,
+                content_hash: Optional[str] = None) -> IngestionJob:
+        """Persist a new job, raising QueueFullError when the queue is full."""
+        self.check_capacity(db)
+
+        job = IngestionJob(
+            filename=filename,
+            file_path=file_path,
+            content_hash=content_hash,
+            status="queued",
+            priority=priority,
+            stage="queued",
+            progress=json.dumps({})
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+
+    def find_pending(self, db: Session, content_hash: str) -> Optional[IngestionJob]:
+        """Return a queued or running job for the same content, if any."""
+        return (
+            db.query(IngestionJob)
+            .filter(
+                IngestionJob.content_hash == content_hash,
+                IngestionJob.status.in_(["queued", "running"])
+            )
+            .first()
+        )
+
+    def start(self) -> None:
+        """Requeue jobs whose lease expired and start the worker and heartbeat threads."""
+        db = SessionLocal()
+        try:
+            self._requeue_expired(db)
+        finally:
+            db.close()
+
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"ingestion-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="ingestion-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _requeue_expired(self, db: Session) -> int:
+        """Requeue running jobs whose worker stopped renewing their lease."""
+        expired_before = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        requeued = db.query(IngestionJob).filter(
+            IngestionJob.status == "running",
+            (IngestionJob.heartbeat_at.is_(None)) | (IngestionJob.heartbeat_at < expired_before)
+        ).update(
+            {"status": "queued", "stage": "queued", "claimed_by": None, "heartbeat_at": None},
+            synchronize_session=False
+        )
+        db.commit()
+        if requeued:
+            logger.warning("Requeued %d ingestion jobs whose lease expired", requeued)
+        return requeued
+
+    def _heartbeat(self) -> None:
+        while not self._stopping.wait(self.heartbeat_interval):
+            db = SessionLocal()
+            try:
+                db.query(IngestionJob).filter(
+                    IngestionJob.status == "running",
+                    IngestionJob.claimed_by == self.worker_id
+                ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+                db.commit()
+                self._requeue_expired(db)
+            except Exception:
+                logger.exception("Ingestion heartbeat error")
+            finally:
+                db.close()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Signal workers to stop after their current job."""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _claim_next(self, db: Session) -> Optional[IngestionJob]:
+        """Atomically claim the next queued job, if any."""
+        while True:
+            job = (
+                db.query(IngestionJob)
+                .filter(IngestionJob.status == "queued")
+                .order_by(IngestionJob.priority.desc(), IngestionJob.id.asc())
+                .first()
+            )
+            if job is None:
+                return None
+
+            now = datetime.utcnow()
+            claimed = db.query(IngestionJob).filter(
+                IngestionJob.id == job.id,
+                IngestionJob.status == "queued"
+            ).update(
+                {
+                    "status": "running", "stage": "starting", "started_at": now,
+                    "claimed_by": self.worker_id, "heartbeat_at": now
+                },
+                synchronize_session=False
+            )
+            db.commit()
+            if claimed:
+                db.refresh(job)
+                return job
+            # Another worker won the race; try the next job
+
+    def _worker(self) -> None:
+        while not self._stopping.is_set():
+            db = SessionLocal()
+            try:
+                job = self._claim_next(db)
+                if job is not None:
+                    self._run(db, job)
+                    continue
+            except Exception:
+                logger.exception("Ingestion worker error")
+            finally:
+                db.close()
+
+            with self._wakeup:
+                self._wakeup.wait(self.poll_interval)
+
+    def _run(self, db: Session, job: IngestionJob) -> None:
+        progress: Dict[str, Dict[str, int]] = {}
+        last_write = 0.0
+
+        def on_progress(stage: str, done: int, total: int) -> None:
+            nonlocal last_write
+            progress[stage] = {"done": done, "total": total}
+            now = time.monotonic()
+            # Throttle writes, but always record stage transitions and completions
+            if job.stage != stage or done >= total or now - last_write >= 0.5:
+                job.stage = stage
+                job.progress = json.dumps(progress)
+                db.commit()
+                last_write = now
+
+        # Processing gets its own session so progress commits never touch its transaction
+        processing_db = SessionLocal()
+        try:
+            processor = DocumentProcessor(processing_db)
+            document = asyncio.run(processor.process_document(
+                job.file_path, job.filename, on_progress, job.content_hash
+            ))
+            job.status = "completed"
+            job.stage = "done"
+            job.document_id = document.id
+            if document.original_path != job.file_path and os.path.exists(job.file_path):
+                # Duplicate of an already processed document; drop the extra copy
+                os.remove(job.file_path)
+        except Exception as e:
+            db.rollback()
+            logger.exception("Ingestion job %s failed", job.id)
+            job.status = "failed"
+            job.error = str(e)
+            # Clean up file if processing fails
+            if job.file_path and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+        finally:
+            processing_db.close()
+        job.progress = json.dumps(progress)
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+
+ingestion_queue = IngestionQueue(
+    workers=settings.INGESTION_WORKERS,
+    max_queue_depth=settings.INGESTION_MAX_QUEUE_DEPTH,
+    poll_interval=settings.INGESTION_POLL_INTERVAL,
+    heartbeat_interval=settings.INGESTION_HEARTBEAT_INTERVAL,
+    lease_seconds=settings.INGESTION_LEASE_SECONDS
+)
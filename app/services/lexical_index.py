@@ -0,0 +1,143 @@
+from typing import List, Dict, Any, Optional
+import re
+from sqlalchemy import column, literal_column, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from ..db.database import SessionLocal, engine
+from ..db.models import Page, Paragraph
+from .search_filters import SearchFilters
+
+# Terms are identifiers, words and numbers, keeping joiners such as INV-001 or 4.2.1 together
+_TERM_RE = re.compile(r"\w+(?:[\-./:]\w+)*", re.UNICODE)
+
+
+def _is_sqlite(bind: Engine) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+def ensure_lexical_index(bind: Engine = engine) -> None:
+    """
+    Create the full-text index over paragraphs if it does not exist.
+
+    SQLite uses an FTS5 table that DocumentProcessor keeps in sync and that is
+    backfilled from existing paragraphs when first created. Postgres uses a GIN
+    expression index on to_tsvector(content), which needs no syncing.
+    """
+    with bind.begin() as conn:
+        if _is_sqlite(bind):
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'paragraphs_fts'"
+            )).first()
+            if exists:
+                return
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE paragraphs_fts USING fts5("
+                "content, paragraph_id UNINDEXED, doc_id UNINDEXED, page UNINDEXED, "
+                "paragraph_number UNINDEXED, tokenize = 'unicode61')"
+            ))
+            conn.execute(text(
+                "INSERT INTO paragraphs_fts (content, paragraph_id, doc_id, page, paragraph_number) "
+                "SELECT p.content, p.id, pg.document_id, pg.page_number, p.paragraph_number "
+                "FROM paragraphs p JOIN pages pg ON pg.id = p.page_id"
+            ))
+        elif bind.dialect.name == "postgresql":
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_paragraphs_content_fts "
+                "ON paragraphs USING GIN (to_tsvector('simple', content))"
+            ))
+
+
+def index_document(db: Session, document_id: int) -> None:
+    """Add a document's paragraphs to the index within the caller's transaction."""
+    if not _is_sqlite(db.get_bind()):
+        return
+    db.execute(text(
+        "INSERT INTO paragraphs_fts (content, paragraph_id, doc_id, page, paragraph_number) "
+        "SELECT p.content, p.id, pg.document_id, pg.page_number, p.paragraph_number "
+        "FROM paragraphs p JOIN pages pg ON pg.id = p.page_id "
+        "WHERE pg.document_id = :document_id"
+    ), {"document_id": document_id})
+
+
+def delete_document(db: Session, document_id: int) -> None:
+    """Remove a document's paragraphs from the index within the caller's transaction."""
+    if not _is_sqlite(db.get_bind()):
+        return
+    db.execute(text("DELETE FROM paragraphs_fts WHERE doc_id = :document_id"), {"document_id": document_id})
+
+
+def clear_index(db: Session) -> None:
+    """Remove every paragraph from the index within the caller's transaction."""
+    if not _is_sqlite(db.get_bind()):
+        return
+    db.execute(text("DELETE FROM paragraphs_fts"))
+
+
+def _query_terms(query: str) -> List[str]:
+    return _TERM_RE.findall(query)
+
+
+_paragraphs_fts = table("paragraphs_fts", column("content"), column("doc_id"), column("page"), column("paragraph_number"))
+
+
+def search_paragraphs(query: str, k: int = 5, filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+    """
+    Full-text search over paragraphs without any embedding call.
+
+    Any query term may match; results are ranked by BM25 (SQLite) or
+    ts_rank (Postgres). Terms such as invoice numbers are matched as phrases.
+
+    Args:
+        query: The search query
+        k: Number of results to return
+        filters: Optional restriction to a subset of documents, applied in the query
+
+    Returns:
+        Matching paragraphs with their metadata and a relevance score
+    """
+    terms = _query_terms(query)
+    if not terms:
+        return []
+    filters = filters or SearchFilters()
+
+    db = SessionLocal()
+    try:
+        if _is_sqlite(db.get_bind()):
+            match = " OR ".join('"' + term.replace('"', '') + '"' for term in terms)
+            fts = _paragraphs_fts.c
+            statement = (
+                select(fts.content, fts.doc_id, fts.page, fts.paragraph_number,
+                       literal_column("-bm25(paragraphs_fts)").label("score"))
+                .where(text("paragraphs_fts MATCH :match"), *filters.document_conditions(fts.doc_id))
+                .order_by(text("bm25(paragraphs_fts)"))
+                .limit(k)
+            )
+            rows = db.execute(statement, {"match": match}).all()
+        else:
+            tsquery = " or ".join('"' + term + '"' for term in terms)
+            vector = "to_tsvector('simple', paragraphs.content)"
+            statement = (
+                select(Paragraph.content, Page.document_id, Page.page_number, Paragraph.paragraph_number,
+                       literal_column(f"ts_rank({vector}, websearch_to_tsquery('simple', :tsquery))").label("score"))
+                .join(Page, Page.id == Paragraph.page_id)
+                .where(text(f"{vector} @@ websearch_to_tsquery('simple', :tsquery)"),
+                       *filters.document_conditions(Page.document_id))
+                .order_by(text("score DESC"))
+                .limit(k)
+            )
+            rows = db.execute(statement, {"tsquery": tsquery}).all()
+    finally:
+        db.close()
+
+    return [
+        {
+            "text": content,
+            "metadata": {
+                "doc_id": str(doc_id),
+                "page": int(page),
+                "paragraph": int(paragraph_number)
+            },
+            "score": float(score)
+        }
+        for content, doc_id, page, paragraph_number, score in rows
+    ]
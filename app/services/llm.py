@@ -0,0 +1,105 @@
+from typing import AsyncIterator
+from functools import lru_cache
+import asyncio
+import re
+import threading
+import weakref
+import google.generativeai as genai
+from ..core.config import settings
+
+_configure_lock = threading.Lock()
+_configured = False
+
+
+def configure_gemini() -> None:
+    """Configure the Gemini client once, on first use rather than at import time."""
+    global _configured
+    if _configured:
+        return
+    with _configure_lock:
+        if not _configured:
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            _configured = True
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGenerativeModel:
+    """
+    Offline stand-in for the Gemini model, selected with LLM_BACKEND=stub.
+
+    Answers are canned text that cites the first citation found in the
+    prompt, so citation and theme parsing still do real work; a prompt
+    without one gets an answer without citations. Each call
+    sleeps settings.LLM_STUB_DELAY seconds to model provider latency.
+    """
+
+    _citation_re = re.compile(r"\[Doc ID: (\d+), Page: (\d+), Paragraph: (\d+)\]")
+
+    def _text(self, prompt: str) -> str:
+        match = self._citation_re.search(prompt)
+        citation = match.group(0) if match else ""
+        if "identify the main themes" in prompt:
+            return f"Theme 1: Stub theme\nSummary: Stub summary.\nSupported by: {citation}"
+        if not citation:
+            return "Stub answer based on the context."
+        return f"Stub answer based on the context {citation}.\nCitations: {citation}"
+
+    async def _stream(self, text: str):
+        for word in text.split(" "):
+            yield _StubResponse(word + " ")
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        await asyncio.sleep(settings.LLM_STUB_DELAY)
+        text = self._text(prompt)
+        return self._stream(text) if stream else _StubResponse(text)
+
+
+LLM_BACKENDS = ("gemini", "stub")
+
+
+@lru_cache(maxsize=None)
+def get_generative_model(model_name: str = None) -> genai.GenerativeModel:
+    """Return the shared generative model for settings.LLM_BACKEND."""
+    if settings.LLM_BACKEND == "stub":
+        return StubGenerativeModel()
+    if settings.LLM_BACKEND != "gemini":
+        raise ValueError(f"Unknown LLM backend: {settings.LLM_BACKEND}. Allowed backends: {', '.join(LLM_BACKENDS)}")
+    configure_gemini()
+    return genai.GenerativeModel(model_name or settings.LLM_MODEL)
+
+
+_llm_semaphores = weakref.WeakKeyDictionary()
+
+
+def _get_llm_slots() -> asyncio.Semaphore:
+    """Per-event-loop semaphore bounding concurrent LLM calls."""
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _llm_semaphores[loop] = asyncio.Semaphore(settings.LLM_CONCURRENCY)
+    return semaphore
+
+
+async def generate_text(prompt: str) -> str:
+    """Generate text with the async Gemini client, bounded by settings.LLM_CONCURRENCY."""
+    async with _get_llm_slots():
+        response = await get_generative_model().generate_content_async(prompt)
+    return response.text
+
+
+async def stream_text(prompt: str) -> AsyncIterator[str]:
+    """
+    Stream generated text fragments from the async Gemini client.
+
+    Cancelling the consuming task, or closing this generator, stops reading
+    the stream and cancels the upstream request.
+    """
+    async with _get_llm_slots():
+        response = await get_generative_model().generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
@@ -0,0 +1,134 @@
+from typing import List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import math
+import multiprocessing
+import threading
+import pytesseract
+from PIL import Image
+from ..core.config import settings
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # pragma: no cover - PyMuPDF is optional at runtime
+    fitz = None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _new_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Create a process pool that does not fork the calling process.
+
+    Pools are created from threaded servers and workers; forking copies
+    whatever locks other threads held at that moment (SQLite, Chroma,
+    logging), which can deadlock the children. forkserver starts workers
+    from a clean single-threaded process; spawn is used where it is missing.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool used to fan out PDF pages."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _new_pool(settings.OCR_WORKERS)
+    return _pool
+
+
+def _ocr_image(image: Image.Image, tesseract_cmd: Optional[str]) -> str:
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    return pytesseract.image_to_string(image)
+
+
+def _extract_range_pymupdf(args: Tuple[str, int, int, int, Optional[str]]) -> List[str]:
+    """Extract pages [start, end) of a PDF, rendering and OCRing text-less pages in memory."""
+    file_path, start, end, dpi, tesseract_cmd = args
+    pages = []
+    with fitz.open(file_path) as pdf:
+        for page_index in range(start, end):
+            page = pdf[page_index]
+            text = page.get_text()
+            if not text.strip():
+                # If no text found, render the page in memory and use OCR
+                pix = page.get_pixmap(dpi=dpi)
+                image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+                text = _ocr_image(image, tesseract_cmd)
+            pages.append(text)
+    return pages
+
+
+def extract_with_pymupdf(file_path: str, workers: Optional[int] = None) -> List[str]:
+    """
+    Extract page texts with PyMuPDF, spreading page ranges across a process pool.
+
+    Args:
+        file_path: Path of the PDF
+        workers: Number of worker processes (default: settings.OCR_WORKERS); 1 runs in-process
+
+    Returns:
+        One text per page, in page order
+    """
+    workers = workers or settings.OCR_WORKERS
+    with fitz.open(file_path) as pdf:
+        page_count = pdf.page_count
+
+    dpi = settings.PDF_OCR_DPI
+    if workers <= 1 or page_count < settings.PDF_PARALLEL_MIN_PAGES:
+        return _extract_range_pymupdf((file_path, 0, page_count, dpi, settings.TESSERACT_CMD))
+
+    # Several ranges per worker so one slow (scanned) range does not stall the rest
+    range_size = max(1, math.ceil(page_count / (workers * 4)))
+    ranges = [
+        (file_path, start, min(start + range_size, page_count), dpi, settings.TESSERACT_CMD)
+        for start in range(0, page_count, range_size)
+    ]
+    pool = _get_pool() if workers == settings.OCR_WORKERS else _new_pool(workers)
+    try:
+        # map() yields results in submission order, which preserves page order
+        return [text for texts in pool.map(_extract_range_pymupdf, ranges) for text in texts]
+    finally:
+        if pool is not _pool:
+            pool.shutdown()
+
+
+def extract_with_pdfplumber(file_path: str) -> List[str]:
+    """Extract page texts with pdfplumber, OCRing text-less pages through poppler."""
+    import pdfplumber
+    from pdf2image import convert_from_path
+
+    pages = []
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages:
+            text = page.extract_text()
+            if text:
+                pages.append(text)
+            else:
+                # If no text found, use OCR
+                images = convert_from_path(file_path, first_page=page.page_number, last_page=page.page_number)
+                for image in images:
+                    pages.append(_ocr_image(image, settings.TESSERACT_CMD))
+    return pages
+
+
+def extract_pdf_pages(file_path: str, engine: Optional[str] = None, workers: Optional[int] = None) -> List[str]:
+    """
+    Extract one text per page from a PDF.
+
+    Args:
+        file_path: Path of the PDF
+        engine: "pymupdf" or "pdfplumber" (default: settings.PDF_ENGINE); falls back
+            to pdfplumber when PyMuPDF is not installed
+        workers: Worker processes for the PyMuPDF engine
+
+    Returns:
+        One text per page, in page order
+    """
+    engine = engine or settings.PDF_ENGINE
+    if engine == "pymupdf" and fitz is not None:
+        return extract_with_pymupdf(file_path, workers)
+    return extract_with_pdfplumber(file_path)
@@ -1,68 +1,106 @@
-from typing import List, Dict, Any
-import google.generativeai as genai
+from typing import List, Dict, Any, AsyncIterator, Iterable, Optional, Tuple
+import asyncio
+import logging
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload, selectinload
 from ..core.config import settings
-from .vector_store import search_similar_chunks
+from .llm import generate_text, stream_text
+from ..core.executors import run_blocking
+from .vector_store import search_similar_chunks, chunk_paragraph_label
 from ..db.database import SessionLocal
-from ..db.models import Document, Page, Paragraph
+from ..db.models import Page, Paragraph
 from .theme_synthesizer import synthesize_themes
+from .context_packer import pack_context, count_tokens_uncached
+from ..core.metrics import stage, PROMPT_TOKENS
+from .citations import parse_citations, build_paragraph_index, resolve_citations
+from .query_cache import get_query_cache, get_corpus_version, normalize_query
+from .search_filters import SearchFilters
 
-# Initialize Gemini
-genai.configure(api_key=settings.GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash')
+logger = logging.getLogger(__name__)
 
-def get_all_document_content() -> List[Dict[str, Any]]:
-    """Get all document content from the database."""
+
+def _page_to_content(page: Page) -> Dict[str, Any]:
+    return {
+        "doc_id": str(page.document_id),
+        "page": page.page_number,
+        "content": page.content,
+        "paragraphs": [
+            {
+                "paragraph_number": p.paragraph_number,
+                "content": p.content
+            }
+            for p in sorted(page.paragraphs, key=lambda p: p.paragraph_number)
+        ]
+    }
+
+def get_all_document_content(filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+    """Get all document content from the database, or the content of the documents matching filters."""
+    filters = filters or SearchFilters()
     db = SessionLocal()
     try:
-        documents = db.query(Document).all()
-        all_content = []
-        
-        for doc in documents:
-            for page in doc.pages:
-                page_content = {
-                    "doc_id": str(doc.id),
-                    "page": page.page_number,
-                    "content": page.content,
-                    "paragraphs": [
-                        {
-                            "paragraph_number": p.paragraph_number,
-                            "content": p.content
-                        }
-                        for p in page.paragraphs
-                    ]
-                }
-                all_content.append(page_content)
-        
-        return all_content
+        pages = (
+            db.query(Page)
+            .options(selectinload(Page.paragraphs))
+            .filter(*filters.document_conditions(Page.document_id))
+            .order_by(Page.document_id, Page.page_number)
+            .all()
+        )
+        return [_page_to_content(page) for page in pages]
+    finally:
+        db.close()
+
+def _context_page_keys(chunks: List[Dict[str, Any]], neighbours: int) -> Iterable[tuple]:
+    """Return the (doc_id, page) pairs covered by the chunks and their neighbouring pages."""
+    keys = set()
+    for chunk in chunks:
+        metadata = chunk["metadata"]
+        doc_id = str(metadata["doc_id"])
+        if not doc_id.isdigit():
+            # Test fixtures in the vector store have no database rows
+            continue
+        page = int(metadata["page"])
+        for page_number in range(max(1, page - neighbours), page + neighbours + 1):
+            keys.add((int(doc_id), page_number))
+    return keys
+
+def get_context_for_chunks(chunks: List[Dict[str, Any]], neighbours: int = None,
+                           filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+    """
+    Get the content of the pages behind the retrieved chunks.
+    
+    Pages and their paragraphs are fetched with one query keyed on (doc_id, page).
+    
+    Args:
+        chunks: Chunks returned by search_similar_chunks
+        neighbours: Pages on either side to include (default: settings.QA_NEIGHBOR_PAGES)
+        filters: Optional restriction to a subset of documents, applied in the query
+    
+    Returns:
+        Page content dictionaries in the same shape as get_all_document_content
+    """
+    neighbours = settings.QA_NEIGHBOR_PAGES if neighbours is None else neighbours
+    filters = filters or SearchFilters()
+    keys = _context_page_keys(chunks, neighbours)
+    if not keys:
+        return []
+    
+    db = SessionLocal()
+    try:
+        pages = (
+            db.query(Page)
+            .options(joinedload(Page.paragraphs))
+            .filter(tuple_(Page.document_id, Page.page_number).in_(list(keys)))
+            .filter(*filters.document_conditions(Page.document_id))
+            .order_by(Page.document_id, Page.page_number)
+            .all()
+        )
+        return [_page_to_content(page) for page in pages]
     finally:
         db.close()
 
 def format_context(chunks: List[Dict[str, Any]], all_content: List[Dict[str, Any]]) -> str:
-    """Format retrieved chunks and all document content into a context string with citations."""
-    if not chunks and not all_content:
-        return "No documents available."
-        
-    context = "Here are the relevant document chunks and their full context:\n\n"
-    
-    # First add the retrieved chunks
-    if chunks:
-        context += "Most relevant chunks:\n"
-        for chunk in chunks:
-            metadata = chunk["metadata"]
-            context += f"[Doc ID: {metadata['doc_id']}, Page: {metadata['page']}, Chunk: {metadata['chunk_num']}]\n"
-            context += f"{chunk['text']}\n\n"
-    
-    # Then add all document content
-    context += "\nFull document content:\n"
-    for doc in all_content:
-        context += f"\n[Doc ID: {doc['doc_id']}, Page: {doc['page']}]\n"
-        context += f"Content: {doc['content']}\n"
-        context += "Paragraphs:\n"
-        for para in doc['paragraphs']:
-            context += f"[Paragraph {para['paragraph_number']}]: {para['content']}\n"
-        context += "\n"
-    
-    return context
+    """Format retrieved chunks and document content into a token-budgeted context string with citations."""
+    return pack_context(chunks, all_content).text
 
 def generate_qa_prompt(question: str, context: str) -> str:
     """Generate a prompt for the LLM to answer the question with citations."""
@@ -77,8 +115,52 @@ Please provide your answer followed by a "Citations:" section listing all the so
 
 Answer:"""
 
-def format_answer_for_table(answer: str, chunks: List[Dict[str, Any]], all_content: List[Dict[str, Any]]) -> List[Dict[str, str]]:
-    """Format the LLM's answer into a table-like structure."""
+def chunk_citation_rows(chunks: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Format retrieved chunks as citation rows."""
+    return [
+        {
+            "doc_id": chunk["metadata"]["doc_id"],
+            "content": chunk["text"],
+            "page": str(chunk["metadata"]["page"]),
+            "paragraph": chunk_paragraph_label(chunk["metadata"])
+        }
+        for chunk in chunks
+    ]
+
+def chunk_paragraph_rows(chunks: List[Dict[str, Any]], all_content: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    Format the paragraphs covered by retrieved chunks as citation rows, best chunk first.
+
+    Unlike chunk_citation_rows, each row is one paragraph with its real
+    number, so a prompt built from these rows can be cited paragraph by
+    paragraph and the citations resolve.
+    """
+    paragraph_index = build_paragraph_index(all_content)
+    rows: Dict[Tuple[str, int, int], Dict[str, str]] = {}
+    for chunk in chunks:
+        metadata = chunk["metadata"]
+        doc_id, page = str(metadata["doc_id"]), int(metadata["page"])
+        if "para_start" in metadata:
+            numbers = range(int(metadata["para_start"]), int(metadata["para_end"]) + 1)
+        else:
+            numbers = [
+                paragraph for (d, p, paragraph), content in paragraph_index.items()
+                if d == doc_id and p == page and content in chunk["text"]
+            ]
+        for paragraph in numbers:
+            key = (doc_id, page, paragraph)
+            if key in paragraph_index and key not in rows:
+                rows[key] = {
+                    "doc_id": doc_id,
+                    "content": paragraph_index[key],
+                    "page": str(page),
+                    "paragraph": str(paragraph)
+                }
+    return list(rows.values())
+
+def format_answer_for_table(answer: str, chunks: List[Dict[str, Any]], all_content: List[Dict[str, Any]],
+                            filters: Optional[SearchFilters] = None) -> List[Dict[str, str]]:
+    """Format the LLM's answer into a table-like structure, resolving citations within filters."""
     # Split answer into main answer and citations
     parts = answer.split("Citations:")
     main_answer = parts[0].strip()
@@ -98,69 +180,188 @@ def format_answer_for_table(answer: str, chunks: List[Dict[str, Any]], all_conte
     # Add citation rows
     if citations:
         # First add the retrieved chunks
-        for chunk in chunks:
-            metadata = chunk["metadata"]
-            table_rows.append({
-                "doc_id": metadata["doc_id"],
-                "content": chunk["text"],
-                "page": str(metadata["page"]),
-                "paragraph": str(metadata["chunk_num"])
-            })
+        table_rows.extend(chunk_citation_rows(chunks))
         
-        # Then add any additional cited content from the full documents
-        for doc in all_content:
-            for para in doc["paragraphs"]:
-                citation_pattern = f"[Doc ID: {doc['doc_id']}, Page: {doc['page']}, Paragraph: {para['paragraph_number']}]"
-                if citation_pattern in citations:
-                    table_rows.append({
-                        "doc_id": doc["doc_id"],
-                        "content": para["content"],
-                        "page": str(doc["page"]),
-                        "paragraph": str(para["paragraph_number"])
-                    })
+        # Then add the cited paragraphs, resolved from the loaded content or the database
+        resolved = resolve_citations(parse_citations(citations), build_paragraph_index(all_content), filters)
+        for (doc_id, page, paragraph), content in resolved:
+            if content is not None:
+                table_rows.append({
+                    "doc_id": doc_id,
+                    "content": content,
+                    "page": str(page),
+                    "paragraph": str(paragraph)
+                })
     
     return table_rows
 
-async def answer_question(question: str, k: int = 5) -> List[Dict[str, str]]:
+NO_DOCUMENTS_ROW = {
+    "doc_id": "Answer",
+    "content": "No documents have been processed yet. Please upload some documents first.",
+    "page": "",
+    "paragraph": ""
+}
+
+NO_MATCHING_DOCUMENTS_ROW = {
+    "doc_id": "Answer",
+    "content": "No processed documents match the given filters.",
+    "page": "",
+    "paragraph": ""
+}
+
+def _no_documents_row(filters: SearchFilters) -> Dict[str, str]:
+    return dict(NO_DOCUMENTS_ROW if filters.is_empty() else NO_MATCHING_DOCUMENTS_ROW)
+
+async def _prepare_answer(question: str, k: int, filters: SearchFilters) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], str]]:
+    """Retrieve chunks and context and build the QA prompt, or return None if there are no documents."""
+    # Retrieve relevant chunks
+    with stage("retrieve"):
+        chunks = await run_blocking(search_similar_chunks, question, k, filters)
+    
+    # Get the document content behind the chunks, or the whole (filtered) corpus in full mode
+    with stage("context_load"):
+        if settings.QA_CONTEXT_MODE == "full":
+            all_content = await run_blocking(get_all_document_content, filters)
+        else:
+            all_content = await run_blocking(get_context_for_chunks, chunks, None, filters)
+    
+    if not all_content and not chunks:
+        return None
+    
+    # Format context with citations within the token budget
+    with stage("pack_context"):
+        packed = await run_blocking(pack_context, chunks, all_content)
+    logger.info(
+        "Packed QA context: %d tokens used, %d dropped, %d duplicate sections removed",
+        packed.tokens_used, packed.tokens_dropped, packed.duplicates_removed
+    )
+    
+    # Generate prompt
+    prompt = generate_qa_prompt(question, packed.text)
+    PROMPT_TOKENS.observe(count_tokens_uncached(prompt), prompt="answer")
+    return chunks, all_content, prompt
+
+async def answer_question(question: str, k: int = 5, filters: Optional[SearchFilters] = None) -> List[Dict[str, str]]:
     """
     Answer a question using retrieved chunks and LLM.
     
+    Answers are cached per normalized question, k, filters and corpus
+    version, and concurrent identical questions share one computation.
+    
     Args:
         question: The question to answer
         k: Number of chunks to retrieve (default: 5)
+        filters: Optional restriction to a subset of documents, pushed down
+            into retrieval and the context query
     
     Returns:
         List of dictionaries containing the answer, citations, and themes in table format
     """
-    # Get all document content
-    all_content = get_all_document_content()
-    
-    if not all_content:
-        return [{
-            "doc_id": "Answer",
-            "content": "No documents have been processed yet. Please upload some documents first.",
-            "page": "",
-            "paragraph": ""
-        }]
-    
-    # Retrieve relevant chunks
-    chunks = search_similar_chunks(question, k)
+    filters = filters or SearchFilters()
+    cache = get_query_cache()
+    if cache is None:
+        return await _answer_question(question, k, filters)
+    key = ("ask", normalize_query(question), k, filters, get_corpus_version())
+    return await cache.get_or_compute_async(key, lambda: _answer_question(question, k, filters))
+
+async def _answer_question(question: str, k: int, filters: SearchFilters) -> List[Dict[str, str]]:
+    prepared = await _prepare_answer(question, k, filters)
+    if prepared is None:
+        return [_no_documents_row(filters)]
+    chunks, all_content, prompt = prepared
     
-    # Format context with citations
-    context = format_context(chunks, all_content)
+    # Theme synthesis only needs citation rows, which come from the paragraphs of
+    # the retrieved chunks, so in pipelined mode it runs concurrently with the answer call
+    theme_task = None
+    if settings.QA_PIPELINE_THEMES:
+        theme_task = asyncio.create_task(
+            _synthesize_themes_with_timeout(chunk_paragraph_rows(chunks, all_content), all_content, filters)
+        )
     
-    # Generate prompt
-    prompt = generate_qa_prompt(question, context)
-    
-    # Get answer from LLM
-    response = model.generate_content(prompt)
-    answer = response.text
+    try:
+        # Get answer from LLM
+        with stage("llm_answer"):
+            answer = await asyncio.wait_for(generate_text(prompt), settings.QA_ANSWER_TIMEOUT)
+    except BaseException:
+        if theme_task:
+            theme_task.cancel()
+        raise
     
     # Format answer into table structure
-    answer_rows = format_answer_for_table(answer, chunks, all_content)
+    with stage("resolve_citations"):
+        answer_rows = await run_blocking(format_answer_for_table, answer, chunks, all_content, filters)
     
     # Synthesize themes from the answers
-    theme_rows = await synthesize_themes(answer_rows)
+    if theme_task:
+        theme_rows = await theme_task
+    else:
+        theme_rows = await _synthesize_themes_with_timeout(answer_rows, all_content, filters)
     
     # Combine answer and theme rows
-    return answer_rows + theme_rows 
\ No newline at end of file
+    return answer_rows + theme_rows
+
+async def stream_answer_question(question: str, k: int = 5,
+                                 filters: Optional[SearchFilters] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Answer a question, yielding (event, data) pairs as results become available.
+    
+    Events, in order: "answer" for each text fragment as Gemini produces it,
+    "citations" with the answer and citation rows once the answer is complete,
+    "themes" with the theme rows, then "done". Closing the generator (for
+    example when the client disconnects) cancels the upstream generation and
+    any pending theme synthesis.
+    
+    Args:
+        question: The question to answer
+        k: Number of chunks to retrieve (default: 5)
+        filters: Optional restriction to a subset of documents
+    """
+    filters = filters or SearchFilters()
+    prepared = await _prepare_answer(question, k, filters)
+    if prepared is None:
+        yield "citations", [_no_documents_row(filters)]
+        yield "done", {}
+        return
+    chunks, all_content, prompt = prepared
+    
+    theme_task = None
+    if settings.QA_PIPELINE_THEMES:
+        theme_task = asyncio.create_task(
+            _synthesize_themes_with_timeout(chunk_paragraph_rows(chunks, all_content), all_content, filters)
+        )
+    
+    try:
+        fragments = []
+        # Includes the time the client takes to read each fragment
+        with stage("llm_answer_stream"):
+            async for fragment in stream_text(prompt):
+                fragments.append(fragment)
+                yield "answer", fragment
+        
+        with stage("resolve_citations"):
+            answer_rows = await run_blocking(format_answer_for_table, "".join(fragments), chunks, all_content, filters)
+        yield "citations", answer_rows
+        
+        if theme_task:
+            theme_rows = await theme_task
+        else:
+            theme_rows = await _synthesize_themes_with_timeout(answer_rows, all_content, filters)
+        yield "themes", theme_rows
+        yield "done", {}
+    finally:
+        if theme_task and not theme_task.done():
+            theme_task.cancel()
+
+async def _synthesize_themes_with_timeout(rows: List[Dict[str, str]], all_content: List[Dict[str, Any]],
+                                          filters: SearchFilters) -> List[Dict[str, str]]:
+    """Synthesize themes, degrading to no theme rows if the call is slow or fails."""
+    try:
+        return await asyncio.wait_for(
+            synthesize_themes(rows, build_paragraph_index(all_content), filters),
+            settings.QA_THEME_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Theme synthesis exceeded %.1fs; returning answer only", settings.QA_THEME_TIMEOUT)
+    except Exception:
+        logger.exception("Theme synthesis failed; returning answer only")
+    return [] 
\ No newline at end of file
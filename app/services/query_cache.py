@@ -0,0 +1,182 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import copy
+import threading
+import time
+from ..core.config import settings
+from ..core.metrics import CACHE_REQUESTS
+
+_corpus_version = 0
+_version_lock = threading.Lock()
+
+
+def get_corpus_version() -> int:
+    """Return the current corpus version; cache keys include it."""
+    return _corpus_version
+
+
+def bump_corpus_version() -> int:
+    """
+    Invalidate cached results after documents are added or removed.
+
+    The counter is per process; in multi-worker deployments entries cached
+    by other workers expire through QUERY_CACHE_TTL.
+    """
+    global _corpus_version
+    with _version_lock:
+        _corpus_version += 1
+        return _corpus_version
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class _ComputationAbandoned(Exception):
+    """Set on a shared computation whose caller was cancelled before it finished."""
+
+
+class QueryCache:
+    """
+    TTL + LRU cache with single-flight computation.
+
+    Concurrent misses for the same key share one computation: sync callers
+    wait on the first caller's thread, async callers await its future.
+    Exceptions are propagated to every waiter and never cached.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, name: str = "query"):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sync_inflight: Dict[Hashable, Tuple[threading.Event, list]] = {}
+        self._async_inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def _get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache=self.name, result="miss")
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache=self.name, result="miss")
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache=self.name, result="hit")
+            return True, value
+
+    def _set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing it once across threads on a miss."""
+        found, value = self._get(key)
+        if found:
+            return copy.deepcopy(value)
+
+        with self._lock:
+            inflight = self._sync_inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = self._sync_inflight[key] = (threading.Event(), [])
+
+        done, outcome = inflight
+        if not leader:
+            done.wait()
+            if outcome and outcome[0] == "error":
+                raise outcome[1]
+            return copy.deepcopy(outcome[1])
+
+        try:
+            value = compute()
+            self._set(key, value)
+            outcome.extend(["value", value])
+            return copy.deepcopy(value)
+        except BaseException as e:
+            outcome.extend(["error", e])
+            raise
+        finally:
+            with self._lock:
+                self._sync_inflight.pop(key, None)
+            done.set()
+
+    async def get_or_compute_async(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key, awaiting one shared computation on a miss.
+
+        Callers waiting on another caller's computation share its result or
+        its error. If that caller is cancelled (its client disconnected),
+        the waiters are not: one of them starts the computation again.
+        """
+        while True:
+            found, value = self._get(key)
+            if found:
+                return copy.deepcopy(value)
+
+            future = self._async_inflight.get(key)
+            if future is None:
+                break
+            try:
+                return copy.deepcopy(await asyncio.shield(future))
+            except _ComputationAbandoned:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_inflight[key] = future
+        try:
+            value = await compute()
+            self._set(key, value)
+            future.set_result(value)
+            return copy.deepcopy(value)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not logged as never retrieved
+            future.exception()
+            raise
+        except BaseException:
+            # Cancellation belongs to this caller only; let a waiter recompute
+            future.set_exception(_ComputationAbandoned())
+            future.exception()
+            raise
+        finally:
+            self._async_inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+_query_cache: Optional[QueryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> Optional[QueryCache]:
+    """Return the shared query cache, or None when caching is disabled."""
+    global _query_cache
+    if not settings.QUERY_CACHE_ENABLED:
+        return None
+    if _query_cache is None:
+        with _cache_lock:
+            if _query_cache is None:
+                _query_cache = QueryCache(settings.QUERY_CACHE_MAX_ENTRIES, settings.QUERY_CACHE_TTL)
+    return _query_cache
@@ -0,0 +1,105 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from sqlalchemy import select
+from ..db.database import SessionLocal
+from ..db.models import Document
+
+
+def to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Return value as a naive UTC datetime, the way created_at is stored."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def timestamp(value: datetime) -> float:
+    """Seconds since the epoch for a naive UTC datetime, as stored in chunk metadata."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def document_metadata(document: Document) -> Dict[str, Any]:
+    """Document-level metadata stored on each of its chunks, so searches can filter on it."""
+    return {
+        "file_type": document.file_type or "",
+        "created_ts": timestamp(document.created_at)
+    }
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """
+    Restricts search and question answering to a subset of documents.
+
+    Empty fields do not filter. Chunks indexed before file type and creation
+    time were stored on them only match the doc_ids filter until
+    rebuild_index adds the metadata (without re-embedding them).
+    """
+    doc_ids: Optional[Tuple[int, ...]] = None
+    file_types: Optional[Tuple[str, ...]] = None
+    created_from: Optional[datetime] = None  # inclusive, naive UTC
+    created_to: Optional[datetime] = None  # exclusive, naive UTC
+
+    def is_empty(self) -> bool:
+        return (self.doc_ids is None and not self.file_types
+                and self.created_from is None and self.created_to is None)
+
+    def chroma_where(self) -> Optional[Dict[str, Any]]:
+        """Return the filters as a Chroma where clause, or None when they do not filter."""
+        clauses: List[Dict[str, Any]] = []
+        if self.doc_ids is not None:
+            clauses.append({"doc_id": {"$in": [str(doc_id) for doc_id in self.doc_ids]}})
+        if self.file_types:
+            clauses.append({"file_type": {"$in": list(self.file_types)}})
+        if self.created_from is not None:
+            clauses.append({"created_ts": {"$gte": timestamp(self.created_from)}})
+        if self.created_to is not None:
+            clauses.append({"created_ts": {"$lt": timestamp(self.created_to)}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def document_conditions(self, column) -> List[Any]:
+        """Return SQLAlchemy conditions restricting a document id column to matching documents."""
+        conditions = []
+        if self.doc_ids is not None:
+            conditions.append(column.in_(self.doc_ids))
+        document_conditions = []
+        if self.file_types:
+            document_conditions.append(Document.file_type.in_(self.file_types))
+        if self.created_from is not None:
+            document_conditions.append(Document.created_at >= self.created_from)
+        if self.created_to is not None:
+            document_conditions.append(Document.created_at < self.created_to)
+        if document_conditions:
+            conditions.append(column.in_(select(Document.id).where(*document_conditions)))
+        return conditions
+
+
+def build_search_filters(
+    doc_ids: Optional[Sequence[int]] = None,
+    file_types: Optional[Sequence[str]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> SearchFilters:
+    """
+    Build search filters, mapping alias documents to the documents that hold their content.
+
+    Duplicate uploads are recorded as aliases without pages or chunks of
+    their own, so filtering on an alias id filters on the original instead.
+    """
+    resolved = None
+    if doc_ids:
+        db = SessionLocal()
+        try:
+            rows = db.query(Document.id, Document.alias_of_id).filter(Document.id.in_(list(doc_ids))).all()
+        finally:
+            db.close()
+        aliases = {doc_id: alias_of for doc_id, alias_of in rows if alias_of is not None}
+        resolved = tuple(sorted({aliases.get(doc_id, doc_id) for doc_id in doc_ids}))
+    return SearchFilters(
+        doc_ids=resolved,
+        file_types=tuple(sorted({t.lower() for t in file_types})) if file_types else None,
+        created_from=to_utc(created_from),
+        created_to=to_utc(created_to)
+    )
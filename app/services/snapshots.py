@@ -0,0 +1,139 @@
+from typing import Any, Dict, Optional, Tuple
+from pathlib import Path
+import gzip
+import os
+import tempfile
+from sqlalchemy.orm import Session, joinedload
+from ..core.config import settings
+from ..core.responses import dumps
+from ..db.models import Document, Page
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional at runtime
+    brotli = None
+
+# Content-Encoding -> snapshot file suffix, in order of preference
+ENCODINGS = (("br", ".json.br"), ("gzip", ".json.gz"))
+
+
+def snapshot_path(document_id: int, encoding: str = "gzip") -> Path:
+    """Return the path of a document's snapshot compressed with the given encoding."""
+    suffix = dict(ENCODINGS)[encoding]
+    return settings.PROCESSED_DIR / f"{document_id}{suffix}"
+
+
+def build_document_payload(db: Session, document: Document) -> Dict[str, Any]:
+    """
+    Build the full GET /documents/{id} body for a document.
+
+    Pages and paragraphs are loaded with one joined query.
+    """
+    pages = (
+        db.query(Page)
+        .options(joinedload(Page.paragraphs))
+        .filter(Page.document_id == document.id)
+        .order_by(Page.page_number)
+        .all()
+    )
+    return {
+        "id": document.id,
+        "filename": document.filename,
+        "file_type": document.file_type,
+        "alias_of": document.alias_of_id,
+        "created_at": document.created_at.isoformat(),
+        "page_count": len(pages),
+        "pages": [
+            {
+                "page_number": page.page_number,
+                "content": page.content,
+                "paragraphs": [
+                    {
+                        "paragraph_number": p.paragraph_number,
+                        "content": p.content
+                    }
+                    for p in sorted(page.paragraphs, key=lambda p: p.paragraph_number)
+                ]
+            }
+            for page in pages
+        ]
+    }
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_snapshot(document_id: int, payload: Dict[str, Any]) -> Path:
+    """
+    Write a document payload as compact JSON, precompressed.
+
+    A gzip snapshot is always written; a brotli one is added when the brotli
+    module is installed.
+
+    Returns:
+        Path of the gzip snapshot
+    """
+    settings.PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    data = dumps(payload)
+    if brotli is not None:
+        _write_atomic(snapshot_path(document_id, "br"), brotli.compress(data, quality=9))
+    path = snapshot_path(document_id, "gzip")
+    # mtime=0 keeps the bytes, and so the ETag, stable for identical content
+    _write_atomic(path, gzip.compress(data, compresslevel=9, mtime=0))
+    return path
+
+
+def delete_snapshot(document_id: int) -> None:
+    """Remove every snapshot file of a document."""
+    for encoding, _ in ENCODINGS:
+        path = snapshot_path(document_id, encoding)
+        if path.exists():
+            path.unlink()
+
+
+def _accepts(accept_encoding: str, encoding: str) -> bool:
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() in (encoding, "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def find_snapshot(document_id: int, accept_encoding: str = "") -> Optional[Tuple[Path, Optional[str], str]]:
+    """
+    Find the snapshot to serve for a document.
+
+    Returns:
+        (path, content_encoding, etag), or None if the document has no snapshot.
+        content_encoding is None when the client accepts neither encoding and
+        the gzip snapshot must be decompressed before sending.
+    """
+    gzip_path = snapshot_path(document_id, "gzip")
+    try:
+        stat = gzip_path.stat()
+    except FileNotFoundError:
+        return None
+
+    # Weak, because the same content is sent with different encodings
+    etag = f'W/"{document_id}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    for encoding, _ in ENCODINGS:
+        path = snapshot_path(document_id, encoding)
+        if _accepts(accept_encoding, encoding) and (encoding == "gzip" or path.exists()):
+            return path, encoding, etag
+    return gzip_path, None, etag
+
+
+def read_snapshot(path: Path, content_encoding: Optional[str]) -> bytes:
+    """Read snapshot bytes, decompressing gzip when no encoding is sent."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return gzip.decompress(data) if content_encoding is None else data
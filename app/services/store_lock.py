@@ -0,0 +1,51 @@
+from pathlib import Path
+from typing import IO, Optional
+import os
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no advisory locks on Windows
+    fcntl = None
+
+
+class VectorStoreLockedError(Exception):
+    """Raised when another process already has the embedded vector index open."""
+
+
+def lock_store_dir(path: Path, exclusive: bool = True) -> Optional[IO[str]]:
+    """
+    Lock the embedded index directory for writing, for the life of the process.
+
+    An embedded Chroma index caches its state per process: writes made by
+    another process (the CLI, a second uvicorn worker) are counted but not
+    returned by its queries until it restarts. The API server takes a shared
+    lock and offline commands an exclusive one, so writing while the other
+    holds the directory is an error instead of a silent divergence.
+
+    Args:
+        path: Index directory
+        exclusive: Take an exclusive lock instead of a shared one
+
+    Returns:
+        The open lock file, which must be kept referenced to hold the lock
+    """
+    if fcntl is None:
+        return None
+    path.mkdir(parents=True, exist_ok=True)
+    lock_file = open(path / ".lock", "a+")
+    try:
+        fcntl.flock(lock_file, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.seek(0)
+        owner = lock_file.read().strip() or "unknown"
+        lock_file.close()
+        raise VectorStoreLockedError(
+            f"The vector index in {path} is being written by another process (pid {owner}). "
+            "Stop the API server before running index commands, or set CHROMA_HOST "
+            "to share a Chroma server between processes."
+        )
+    # With a shared lock this records the last process to take it
+    lock_file.truncate(0)
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
@@ -1,16 +1,17 @@
-from typing import List, Dict, Any
-import google.generativeai as genai
-from ..core.config import settings
+from typing import List, Dict, Any, Optional
+from ..core.executors import run_blocking
+from ..core.metrics import stage, PROMPT_TOKENS
+from .llm import generate_text
+from .citations import CitationKey, parse_citations, resolve_citations
+from .search_filters import SearchFilters
+from .context_packer import count_tokens_uncached
 
-# Initialize Gemini
-genai.configure(api_key=settings.GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash')
 
 def generate_theme_prompt(answers: List[Dict[str, str]]) -> str:
     """Generate a prompt for the LLM to identify themes from document answers."""
-    # Format answers for the prompt
+    # Format answers for the prompt, labelled with the citation to use for each
     formatted_answers = "\n\n".join([
-        f"Document {answer['doc_id']} (Page {answer['page']}, Paragraph {answer['paragraph']}):\n{answer['content']}"
+        f"[Doc ID: {answer['doc_id']}, Page: {answer['page']}, Paragraph: {answer['paragraph']}]:\n{answer['content']}"
         for answer in answers
         if answer['doc_id'] != 'Answer'  # Exclude the main answer
     ])
@@ -35,9 +36,19 @@ Supported by: [List of citations in format [Doc ID: X, Page: Y, Paragraph: Z]]
 
 Analysis:"""
 
-def format_themes_for_table(themes_text: str) -> List[Dict[str, str]]:
-    """Format the LLM's theme analysis into a table-like structure."""
-    table_rows = []
+def format_themes_for_table(
+    themes_text: str,
+    paragraph_index: Optional[Dict[CitationKey, str]] = None,
+    filters: Optional[SearchFilters] = None
+) -> List[Dict[str, str]]:
+    """
+    Format the LLM's theme analysis into a table-like structure.
+    
+    Citation rows carry the cited paragraph's text, resolved through
+    paragraph_index and one batched database lookup (within filters) for
+    the rest; citations that do not resolve to a paragraph are left out.
+    """
+    themes = []
     
     # Split into themes
     theme_sections = themes_text.split("\n\n")
@@ -60,14 +71,19 @@ def format_themes_for_table(themes_text: str) -> List[Dict[str, str]]:
             if line.startswith("Summary:"):
                 summary = line.replace("Summary:", "").strip()
             elif line.startswith("Supported by:"):
-                citations_text = line.replace("Supported by:", "").strip()
-                # Parse citations
-                citations = [
-                    citation.strip("[]").split(", ")
-                    for citation in citations_text.split("]")
-                    if citation.strip()
-                ]
+                citations = parse_citations(line)
         
+        themes.append((theme_name, summary, citations))
+    
+    # Resolve every cited paragraph at once
+    resolved = dict(resolve_citations(
+        list(dict.fromkeys(key for _, _, citations in themes for key in citations)),
+        paragraph_index,
+        filters
+    ))
+    
+    table_rows = []
+    for theme_name, summary, citations in themes:
         # Add theme row
         table_rows.append({
             "doc_id": f"Theme {theme_name}",
@@ -77,27 +93,31 @@ def format_themes_for_table(themes_text: str) -> List[Dict[str, str]]:
         })
         
         # Add citation rows
-        for citation in citations:
-            if len(citation) >= 3:
-                doc_id = citation[0].replace("Doc ID: ", "")
-                page = citation[1].replace("Page: ", "")
-                paragraph = citation[2].replace("Paragraph: ", "")
-                
-                table_rows.append({
-                    "doc_id": doc_id,
-                    "content": "Supporting evidence",
-                    "page": page,
-                    "paragraph": paragraph
-                })
+        for doc_id, page, paragraph in citations:
+            content = resolved.get((doc_id, page, paragraph))
+            if content is None:
+                continue
+            table_rows.append({
+                "doc_id": doc_id,
+                "content": content,
+                "page": str(page),
+                "paragraph": str(paragraph)
+            })
     
     return table_rows
 
-async def synthesize_themes(answers: List[Dict[str, str]]) -> List[Dict[str, str]]:
+async def synthesize_themes(
+    answers: List[Dict[str, str]],
+    paragraph_index: Optional[Dict[CitationKey, str]] = None,
+    filters: Optional[SearchFilters] = None
+) -> List[Dict[str, str]]:
     """
     Synthesize themes from document answers using LLM.
     
     Args:
         answers: List of document answers with citations
+        paragraph_index: Paragraph text by citation key, from build_paragraph_index
+        filters: Optional restriction on the documents citations may resolve to
     
     Returns:
         List of dictionaries containing themes and their supporting citations
@@ -113,9 +133,12 @@ async def synthesize_themes(answers: List[Dict[str, str]]) -> List[Dict[str, str
     # Generate prompt
     prompt = generate_theme_prompt(answers)
     
+    PROMPT_TOKENS.observe(count_tokens_uncached(prompt), prompt="themes")
+    
     # Get theme analysis from LLM
-    response = model.generate_content(prompt)
-    themes_text = response.text
+    with stage("llm_themes"):
+        themes_text = await generate_text(prompt)
     
     # Format themes into table structure
-    return format_themes_for_table(themes_text) 
\ No newline at end of file
+    with stage("format_themes"):
+        return await run_blocking(format_themes_for_table, themes_text, paragraph_index, filters) 
\ No newline at end of file
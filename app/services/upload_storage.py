@@ -0,0 +1,61 @@
+from typing import Tuple
+from pathlib import Path
+import hashlib
+import os
+import tempfile
+import aiofiles
+from fastapi import UploadFile
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured maximum size."""
+
+
+async def save_upload(file: UploadFile, dest_path: Path, max_bytes: int, chunk_size: int) -> Tuple[str, int]:
+    """
+    Stream an upload to disk in fixed-size chunks.
+    
+    The file is written to a temporary file next to dest_path while its
+    SHA-256 is computed, then atomically renamed into place, so memory use
+    does not depend on the upload size and readers never see partial files.
+    
+    By the time this runs Starlette has already spooled the whole upload to
+    a temporary file, so max_bytes here is the exact per-file limit, not a
+    guard against receiving large bodies; UploadSizeLimitMiddleware rejects
+    oversized requests before they are read.
+    
+    Args:
+        file: Incoming upload
+        dest_path: Final location of the file
+        max_bytes: Maximum accepted size in bytes
+        chunk_size: Bytes read per chunk
+    
+    Returns:
+        Tuple of (sha256 hex digest, size in bytes)
+    """
+    declared_size = getattr(file, "size", None)
+    if declared_size is not None and declared_size > max_bytes:
+        raise UploadTooLargeError(f"File exceeds maximum upload size of {max_bytes} bytes")
+    
+    fd, tmp_path = tempfile.mkstemp(dir=dest_path.parent, prefix=".upload-")
+    os.close(fd)
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, 'wb') as out_file:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"File exceeds maximum upload size of {max_bytes} bytes")
+                sha256.update(chunk)
+                await out_file.write(chunk)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    return sha256.hexdigest(), size
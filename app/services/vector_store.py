@@ -1,84 +1,437 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import re
+import threading
+import time
 import chromadb
 from chromadb.config import Settings
-import google.generativeai as genai
 from ..core.config import settings
+from ..core.metrics import stage, CACHE_REQUESTS
+from .embedding_cache import get_embedding_cache, make_key
+from .embedders import Embedder, get_embedder, embedder_from_name
+from .query_cache import get_query_cache, get_corpus_version, bump_corpus_version, normalize_query
+from .chunker import Chunk, iter_chunks, chunker_version
+from .search_filters import SearchFilters
+from .store_lock import lock_store_dir
 
-# Initialize Gemini
-genai.configure(api_key=settings.GEMINI_API_KEY)
-
-# Initialize ChromaDB client
-chroma_client = chromadb.Client(Settings(
-    persist_directory="data/chroma",
-    anonymized_telemetry=False
-))
-
-# Create or get collection
-collection = chroma_client.get_or_create_collection(
-    name="documents"
-)
-
-def get_embedding(text: str) -> List[float]:
-    """Get embedding for text using Gemini."""
-    result = genai.embed_content(
-        model="embedding-001",
-        content=text,
-        task_type="retrieval_document"
-    )
-    return result["embedding"]
-
-def approximate_tokens(text: str) -> int:
-    """Approximate token count using character-based estimation.
-    This is a rough approximation: 1 token ≈ 4 characters for English text."""
-    return len(text) // 4
-
-def split_text_into_chunks(text: str, max_tokens: int = 500) -> List[str]:
-    """Split text into chunks of maximum token size."""
-    chunks = []
-    current_chunk = []
-    current_tokens = 0
-    
-    # Split by paragraphs first
-    paragraphs = text.split('\n\n')
-    
-    for para in paragraphs:
-        para_tokens = approximate_tokens(para)
-        
-        if current_tokens + para_tokens > max_tokens and current_chunk:
-            chunks.append('\n\n'.join(current_chunk))
-            current_chunk = [para]
-            current_tokens = para_tokens
-        else:
-            current_chunk.append(para)
-            current_tokens += para_tokens
-    
-    if current_chunk:
-        chunks.append('\n\n'.join(current_chunk))
-    
-    return chunks
-
-def store_document_chunks(doc_id: str, page_num: int, chunks: List[str]) -> None:
-    """Store document chunks in the vector database."""
-    for i, chunk in enumerate(chunks):
-        embedding = get_embedding(chunk)
-        collection.add(
-            embeddings=[embedding],
-            documents=[chunk],
-            metadatas=[{
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+# Lock file held while this process writes to the embedded index; see lock_for_writes
+_write_lock = None
+
+def get_client():
+    """
+    Return the Chroma client, connecting on first use.
+
+    Connects to the shared Chroma server when CHROMA_HOST is set, else opens
+    the embedded index in CHROMA_DIR. Importing this module opens nothing.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                chroma_settings = Settings(anonymized_telemetry=False)
+                if settings.CHROMA_HOST:
+                    _client = chromadb.HttpClient(
+                        host=settings.CHROMA_HOST, port=settings.CHROMA_PORT, settings=chroma_settings
+                    )
+                else:
+                    _client = chromadb.PersistentClient(path=str(settings.CHROMA_DIR), settings=chroma_settings)
+    return _client
+
+def lock_for_writes(exclusive: bool = False) -> None:
+    """
+    Lock the embedded index before this process first writes to it.
+
+    An embedded index only serves queries from writes made by its own
+    process, so the API server is its single writer: run it with one worker,
+    or set CHROMA_HOST to share a Chroma server between workers. The server
+    takes a shared lock on its first write; the CLI takes an exclusive one,
+    so neither writes while the other does.
+
+    Args:
+        exclusive: Refuse to share the index with any other writer
+
+    Raises:
+        VectorStoreLockedError: if another process holds a conflicting lock
+    """
+    global _write_lock
+    if settings.CHROMA_HOST or _write_lock is not None:
+        return
+    with _client_lock:
+        if _write_lock is None:
+            _write_lock = lock_store_dir(settings.CHROMA_DIR, exclusive=exclusive)
+
+
+# Records which collection serves queries, which embedder built it and which
+# collection a rebuild is filling for a new embedder; see get_index
+REGISTRY_COLLECTION = "index_registry"
+# Collection used before collections were named by embedder
+LEGACY_COLLECTION = "documents"
+
+class VectorIndex(NamedTuple):
+    """A chunk collection and the embedder whose vectors it holds."""
+    collection: Any
+    embedder: Embedder
+
+def collection_name(embedder_version: str) -> str:
+    """Name of the collection holding chunks embedded by the given embedder."""
+    return "documents-" + re.sub(r"[^a-zA-Z0-9]+", "-", embedder_version).strip("-")
+
+_indexes_lock = threading.Lock()
+_registry_state: Dict[str, str] = {}
+_active: Optional[VectorIndex] = None
+_building: Optional[VectorIndex] = None
+_registry_checked_at = 0.0
+
+def _open_index(name: str, embedder_version: str) -> VectorIndex:
+    collection = get_client().get_or_create_collection(name=name, metadata={"embedder_version": embedder_version})
+    return VectorIndex(collection, embedder_from_name(embedder_version))
+
+def _write_registry(state: Dict[str, str]) -> None:
+    """Replace the registry in one metadata write, so readers never see a partial switch."""
+    lock_for_writes()
+    get_client().get_or_create_collection(REGISTRY_COLLECTION).modify(metadata=state)
+
+def _load_registry() -> None:
+    """Read the registry and open its collections, creating it for a new or pre-registry index."""
+    global _registry_state, _active, _building, _registry_checked_at
+    state = dict(get_client().get_or_create_collection(REGISTRY_COLLECTION).metadata or {})
+    if "active" not in state:
+        names = {c.name if hasattr(c, "name") else c for c in get_client().list_collections()}
+        # An existing index was built with the embedder configured at the time
+        embedder_version = get_embedder().name
+        active = LEGACY_COLLECTION if LEGACY_COLLECTION in names else collection_name(embedder_version)
+        state = {"active": active, "embedder_version": embedder_version, "building": "", "building_embedder": ""}
+        _write_registry(state)
+    if state != _registry_state:
+        if _registry_state and state["active"] != _registry_state.get("active"):
+            # Another process swapped in a rebuilt collection
+            bump_corpus_version()
+        _active = _open_index(state["active"], state["embedder_version"])
+        _building = _open_index(state["building"], state["building_embedder"]) if state.get("building") else None
+        if not _registry_state and _active.embedder.name != get_embedder().name:
+            logger.warning(
+                "The vector index was built with %s but %s is configured; queries use %s until "
+                "an index rebuild (POST /api/v1/index/rebuild) completes",
+                _active.embedder.name, get_embedder().name, _active.embedder.name
+            )
+        _registry_state = state
+    _registry_checked_at = time.monotonic()
+
+def _refresh_registry() -> None:
+    # Loaded on first use; other processes sharing a Chroma server can swap collections, so re-read periodically
+    if not _registry_state or (
+        settings.CHROMA_HOST and time.monotonic() - _registry_checked_at > settings.VECTOR_INDEX_REFRESH_SECONDS
+    ):
+        with _indexes_lock:
+            _load_registry()
+
+def get_index() -> VectorIndex:
+    """Return the collection that serves queries and the embedder to query it with."""
+    _refresh_registry()
+    return _active
+
+def get_collection() -> Any:
+    """Return the collection that serves queries."""
+    return get_index().collection
+
+def write_indexes() -> List[VectorIndex]:
+    """Return every collection chunk writes and deletes go to: the active one and any being rebuilt."""
+    lock_for_writes()
+    _refresh_registry()
+    return [_active] + ([_building] if _building is not None else [])
+
+def begin_index_build(embedder: Embedder) -> VectorIndex:
+    """
+    Start filling a new collection for embedder alongside the active one.
+
+    Until activate_index swaps it in, queries keep using the active
+    collection and ingestion writes to both.
+    """
+    global _building
+    with _indexes_lock:
+        _load_registry()
+        if _registry_state["building"] != collection_name(embedder.name):
+            state = {**_registry_state, "building": collection_name(embedder.name), "building_embedder": embedder.name}
+            _write_registry(state)
+            _load_registry()
+        return _building
+
+def activate_index(index: VectorIndex) -> Optional[str]:
+    """
+    Make a built collection the one that serves queries.
+
+    Returns:
+        Name of the collection it replaced, which the caller may drop once
+        in-flight queries against it have finished
+    """
+    with _indexes_lock:
+        _load_registry()
+        previous = _registry_state["active"]
+        _write_registry({
+            "active": index.collection.name, "embedder_version": index.embedder.name,
+            "building": "", "building_embedder": ""
+        })
+        _load_registry()
+    bump_corpus_version()
+    return previous if previous != index.collection.name else None
+
+def abandon_index_build() -> None:
+    """Stop dual-writing to, and delete, a collection left over from an unfinished rebuild."""
+    with _indexes_lock:
+        _load_registry()
+        name = _registry_state["building"]
+        if not name:
+            return
+        _write_registry({**_registry_state, "building": "", "building_embedder": ""})
+        _load_registry()
+        get_client().delete_collection(name)
+
+def drop_collection(name: str) -> None:
+    """Delete a collection that no longer serves queries."""
+    lock_for_writes()
+    with _indexes_lock:
+        if name in (_registry_state.get("active"), _registry_state.get("building")):
+            raise ValueError(f"Collection {name} is in use")
+        get_client().delete_collection(name)
+
+def _embed_batch(texts: List[str], task_type: str, embedder: Embedder) -> List[List[float]]:
+    """Embed a batch of texts, bypassing the cache."""
+    if task_type == "retrieval_query":
+        with stage("embed_query"):
+            return [embedder.embed_query(text) for text in texts]
+    with stage("embed_documents"):
+        return embedder.embed_documents(texts)
+
+def embed_in_batches(texts: List[str], task_type: str = "retrieval_document",
+                     batch_size: int = None, max_concurrency: int = None,
+                     embedder: Optional[Embedder] = None) -> List[List[float]]:
+    """
+    Embed texts in fixed-size batches with a bounded number of batches in flight.
+    
+    Texts already in the embedding cache are not sent to the provider.
+    
+    Args:
+        texts: Texts to embed
+        task_type: "retrieval_document" or "retrieval_query"
+        batch_size: Texts per embedding call (default: settings.EMBEDDING_BATCH_SIZE)
+        max_concurrency: Maximum concurrent embedding calls (default: settings.EMBEDDING_MAX_CONCURRENCY)
+        embedder: Embedder to use (default: the configured one)
+    
+    Returns:
+        Embeddings in the same order as the input texts
+    """
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    max_concurrency = max_concurrency or settings.EMBEDDING_MAX_CONCURRENCY
+    embedder = embedder or get_embedder()
+    
+    cache = get_embedding_cache()
+    keys = [make_key(embedder.name, task_type, text) for text in texts]
+    cached = cache.get_many(keys) if cache else {}
+    if cache:
+        CACHE_REQUESTS.inc(len(cached), cache="embedding", result="hit")
+        CACHE_REQUESTS.inc(len(keys) - len(cached), cache="embedding", result="miss")
+    
+    # Embed each distinct uncached text once
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+    missing_keys = list(missing)
+    missing_texts = list(missing.values())
+    
+    batches = [missing_texts[i:i + batch_size] for i in range(0, len(missing_texts), batch_size)]
+    if len(batches) <= 1 or max_concurrency <= 1:
+        results = [_embed_batch(batch, task_type, embedder) for batch in batches]
+    else:
+        # map() keeps batch order; the pool size bounds how many calls are in flight
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as pool:
+            results = list(pool.map(lambda batch: _embed_batch(batch, task_type, embedder), batches))
+    
+    fresh = dict(zip(missing_keys, [embedding for batch in results for embedding in batch]))
+    if cache:
+        cache.put_many(fresh)
+    
+    return [cached[key] if key in cached else fresh[key] for key in keys]
+
+def get_embeddings(texts: List[str], task_type: str = "retrieval_document") -> List[List[float]]:
+    """Get embeddings for a batch of texts using the configured embedder."""
+    return embed_in_batches(texts, task_type=task_type)
+
+def get_embedding(text: str, task_type: str = "retrieval_document") -> List[float]:
+    """Get embedding for text using the configured embedder."""
+    return get_embeddings([text], task_type=task_type)[0]
+
+def split_text_into_chunks(text: str, max_tokens: int = None) -> List[str]:
+    """Split text into chunks of at most max_tokens tokens (default: settings.CHUNK_MAX_TOKENS)."""
+    return [chunk.text for chunk in iter_chunks(text, max_tokens)]
+
+def build_chunk_records(doc_id: str, pages: List[Tuple[int, List[Any]]],
+                        document_metadata: Optional[Dict[str, Any]] = None,
+                        embedder_version: Optional[str] = None) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """
+    Build the ids, texts and metadata stored for a document's chunks.
+    
+    Chunks are either plain strings or Chunk objects from the chunker, whose
+    paragraph range, character offsets and chunker version are stored in the
+    metadata. Every chunk records the embedder that embeds it and a hash of
+    its text, which rebuild_index uses to re-embed only what changed.
+    document_metadata (see search_filters.document_metadata) is added to
+    every chunk so searches can filter on it. embedder_version defaults to
+    the configured embedder's name.
+    """
+    ids, documents, metadatas = [], [], []
+    embedder_version = embedder_version or get_embedder().name
+    for page_num, chunks in pages:
+        for i, chunk in enumerate(chunks):
+            metadata = {
                 "doc_id": doc_id,
                 "page": page_num,
-                "chunk_num": i
-            }],
-            ids=[f"{doc_id}_page{page_num}_chunk{i}"]
+                "chunk_num": i,
+                "embedder_version": embedder_version,
+                **(document_metadata or {})
+            }
+            if isinstance(chunk, Chunk):
+                metadata.update({
+                    "para_start": chunk.para_start,
+                    "para_end": chunk.para_end,
+                    "char_start": chunk.char_start,
+                    "char_end": chunk.char_end,
+                    "chunker_version": chunker_version()
+                })
+                chunk = chunk.text
+            metadata["content_hash"] = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+            ids.append(f"{doc_id}_page{page_num}_chunk{i}")
+            documents.append(chunk)
+            metadatas.append(metadata)
+    return ids, documents, metadatas
+
+def chunk_paragraph_label(metadata: Dict[str, Any]) -> str:
+    """Return the paragraph (or paragraph range) a chunk covers, for display in citations."""
+    if "para_start" not in metadata:
+        # Chunks indexed before paragraph spans were recorded
+        return str(metadata["chunk_num"])
+    if metadata["para_start"] == metadata["para_end"]:
+        return str(metadata["para_start"])
+    return f"{metadata['para_start']}-{metadata['para_end']}"
+
+def add_chunk_records(ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+                      index: Optional[VectorIndex] = None) -> None:
+    """Embed chunk records and write them to a collection (default: the active one) in bulk, replacing any with the same ids."""
+    lock_for_writes()
+    index = index or get_index()
+    embeddings = embed_in_batches(documents, embedder=index.embedder)
+    
+    # One add per call unless it exceeds the collection's write batch limit
+    step = settings.VECTOR_WRITE_BATCH_SIZE
+    for i in range(0, len(documents), step):
+        with stage("chroma_write"):
+            index.collection.upsert(
+                embeddings=embeddings[i:i + step],
+                documents=documents[i:i + step],
+                metadatas=metadatas[i:i + step],
+                ids=ids[i:i + step]
+            )
+    bump_corpus_version()
+
+def store_document_pages(doc_id: str, pages: List[Tuple[int, List[Any]]],
+                         document_metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Embed and store the chunks of several pages of a document in bulk.
+    
+    While a rebuild fills a collection for a new embedder, the chunks are
+    written to it as well, each collection with its own embedder.
+    
+    Args:
+        doc_id: Document ID
+        pages: List of (page_num, chunks) tuples; see build_chunk_records
+        document_metadata: Document-level metadata stored on every chunk
+    
+    Returns:
+        Ingestion stats summed over the collections written: number of chunks
+        written, elapsed seconds and chunks/sec, plus the chunks and seconds
+        of each collection under "collections"
+    """
+    start = time.perf_counter()
+    per_collection: Dict[str, Dict[str, float]] = {}
+    for index in write_indexes():
+        index_start = time.perf_counter()
+        ids, documents, metadatas = build_chunk_records(doc_id, pages, document_metadata, index.embedder.name)
+        if not documents:
+            break
+        add_chunk_records(ids, documents, metadatas, index)
+        per_collection[index.collection.name] = {
+            "chunks": len(documents),
+            "seconds": time.perf_counter() - index_start
+        }
+        logger.info(
+            "Stored %d chunks for document %s in %s in %.2fs",
+            len(documents), doc_id, index.collection.name, per_collection[index.collection.name]["seconds"]
+        )
+    
+    elapsed = time.perf_counter() - start
+    chunks = sum(int(entry["chunks"]) for entry in per_collection.values())
+    stats = {
+        "chunks": chunks,
+        "seconds": elapsed,
+        "chunks_per_sec": chunks / elapsed if elapsed > 0 and chunks else 0.0,
+        "collections": per_collection
+    }
+    if len(per_collection) > 1:
+        logger.info(
+            "Stored %d chunks for document %s across %d collections in %.2fs (%.1f chunks/sec)",
+            stats["chunks"], doc_id, len(per_collection), stats["seconds"], stats["chunks_per_sec"]
         )
+    return stats
 
-def search_similar_chunks(query: str, k: int = 5) -> List[Dict[str, Any]]:
-    """Search for similar chunks using semantic search."""
-    query_embedding = get_embedding(query)
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=k
-    )
+def clear_collection() -> None:
+    """Delete every chunk from the active collection and any being rebuilt."""
+    step = settings.VECTOR_WRITE_BATCH_SIZE
+    for index in write_indexes():
+        ids = index.collection.get(include=[])["ids"]
+        for i in range(0, len(ids), step):
+            index.collection.delete(ids=ids[i:i + step])
+    bump_corpus_version()
+
+def delete_document_chunks(doc_id: str) -> None:
+    """Delete a document's chunks from the active collection and any being rebuilt."""
+    for index in write_indexes():
+        index.collection.delete(where={"doc_id": doc_id})
+    bump_corpus_version()
+
+def store_document_chunks(doc_id: str, page_num: int, chunks: List[str]) -> Dict[str, Any]:
+    """Store document chunks in the vector database."""
+    return store_document_pages(doc_id, [(page_num, chunks)])
+
+def search_similar_chunks(query: str, k: int = 5, filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+    """
+    Search for similar chunks using semantic search, served from the query cache when possible.
+    
+    Filters are pushed down into the collection query's where clause, so
+    only chunks of matching documents are considered.
+    """
+    filters = filters or SearchFilters()
+    cache = get_query_cache()
+    if cache is None:
+        return _search_similar_chunks(query, k, filters)
+    key = ("search", normalize_query(query), k, filters, get_corpus_version())
+    return cache.get_or_compute(key, lambda: _search_similar_chunks(query, k, filters))
+
+def _search_similar_chunks(query: str, k: int, filters: SearchFilters) -> List[Dict[str, Any]]:
+    # Embed the query in the same space as the collection it searches
+    index = get_index()
+    query_embedding = embed_in_batches([query], task_type="retrieval_query", embedder=index.embedder)[0]
+    with stage("chroma_query"):
+        results = index.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            where=filters.chroma_where()
+        )
     
     return [
         {
@@ -0,0 +1,98 @@
+"""
+Compare per-row ORM persistence with the bulk path in DocumentProcessor.
+
+Usage:
+    python -m benchmarks.bench_bulk_persistence --pages 1000 --paragraphs 8
+
+Both paths write the same synthetic document to a fresh file-backed SQLite
+database (or --database-url) and report rows/sec.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+# The app's own engine and vector index are never written; keep them off real data
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("CHROMA_DIR", os.path.join(tempfile.gettempdir(), "bench-bulk-persistence-chroma"))
+os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app.db.models import Document, Page, Paragraph
+from app.services.document_processor import DocumentProcessor
+from app.services.lexical_index import ensure_lexical_index
+
+
+def synthetic_pages(pages: int, paragraphs: int) -> list:
+    return [
+        "\n\n".join(
+            f"Page {page_num} paragraph {para_num}: the quick brown fox jumps over the lazy dog."
+            for para_num in range(1, paragraphs + 1)
+        )
+        for page_num in range(1, pages + 1)
+    ]
+
+
+def persist_per_row(db, document: Document, pages: list) -> None:
+    """The previous persistence loop: one commit per page, one ORM add per paragraph."""
+    for page_num, page_content in enumerate(pages, 1):
+        page = Page(document_id=document.id, page_number=page_num, content=page_content)
+        db.add(page)
+        db.commit()
+        for para_num, para_content in enumerate(page_content.split('\n\n'), 1):
+            if para_content.strip():
+                db.add(Paragraph(page_id=page.id, paragraph_number=para_num, content=para_content.strip()))
+    db.commit()
+
+
+def persist_bulk(db, document: Document, pages: list) -> None:
+    DocumentProcessor(db)._persist_pages(document, pages)
+
+
+def run(label: str, persist, database_url: str, pages: list) -> None:
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    if engine.dialect.name == "sqlite":
+        # The FTS table is not part of the models, so drop_all leaves it behind
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS paragraphs_fts"))
+    Base.metadata.create_all(bind=engine)
+    # The bulk path indexes paragraphs for lexical search as it persists them
+    ensure_lexical_index(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        document = Document(filename=f"{label}.txt", file_type="txt")
+        db.add(document)
+        db.commit()
+
+        start = time.perf_counter()
+        persist(db, document, pages)
+        elapsed = time.perf_counter() - start
+
+        rows = db.query(Page).count() + db.query(Paragraph).count()
+        print(f"{label:<10} {rows:8d} rows {elapsed:8.2f}s {rows / elapsed:12.0f} rows/sec")
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--paragraphs", type=int, default=8)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.pages, args.paragraphs)
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        run("per-row", persist_per_row, database_url, pages)
+        run("bulk", persist_bulk, database_url, pages)
+
+
+if __name__ == "__main__":
+    main()
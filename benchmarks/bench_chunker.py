@@ -0,0 +1,56 @@
+"""
+Check that chunking time grows linearly with page size.
+
+Usage:
+    python -m benchmarks.bench_chunker --sizes 0.25,1,4 --max-tokens 500 --overlap 50
+
+Each size (in millions of characters) is chunked as a single paragraph with
+sparse sentence ends, the OCR-style worst case, and as ordinary paragraphs.
+Reports MB/s; the rate should stay roughly flat as the size grows.
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+# Never touch the configured database; the chunker does not need one
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from app.services.chunker import chunk_text
+
+WORDS = ["invoice", "payment", "clause", "warranty", "delivery", "liability", "renewal", "notice."]
+
+
+def build_text(chars: int, paragraphs: bool) -> str:
+    rng = random.Random(0)
+    words, size = [], 0
+    while size < chars:
+        word = rng.choice(WORDS)
+        if paragraphs and rng.random() < 0.02:
+            word += "\n\n"
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="0.25,1,4", help="Comma-separated sizes in millions of characters")
+    parser.add_argument("--max-tokens", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=50)
+    args = parser.parse_args()
+
+    for paragraphs in (False, True):
+        label = "paragraphs" if paragraphs else "single paragraph"
+        for size in (float(s) for s in args.sizes.split(",")):
+            text = build_text(int(size * 1_000_000), paragraphs)
+            start = time.perf_counter()
+            chunks = chunk_text(text, args.max_tokens, args.overlap)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<17} {len(text) / 1e6:6.2f}M chars: {len(chunks):6d} chunks in {elapsed:6.2f}s "
+                  f"({len(text) / 1e6 / elapsed:6.1f} MB/s, max {max(c.tokens for c in chunks)} tokens)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Check that /search latency stays flat while slow /ask calls are in flight.
+
+Usage:
+    python -m benchmarks.bench_concurrency --asks 20 --llm-delay 2.0
+
+Runs the FastAPI app in-process against a temporary database with the
+offline hashing embedder and a stub LLM whose async calls sleep for
+--llm-delay seconds. Exits non-zero if /search p95 under load exceeds
+--max-slowdown times its idle p95 (plus a small absolute allowance).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def measure_search(client, count: int) -> list:
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        response = await client.get("/api/v1/search", params={"query": f"clause {i}", "k": 5})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def run(args: argparse.Namespace) -> int:
+    import httpx
+    from app.main import app
+    from app.db.database import SessionLocal
+    from app.services.document_processor import DocumentProcessor
+
+    # Seed a small corpus directly through the processor
+    for doc_num in range(1, 6):
+        path = os.path.join("data", "uploads", f"doc{doc_num}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(f"Document {doc_num} clause {i} covers payment terms." for i in range(50)))
+        db = SessionLocal()
+        try:
+            await DocumentProcessor(db).process_document(path, f"doc{doc_num}.txt")
+        finally:
+            db.close()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await measure_search(client, 5)  # warm up
+        idle = await measure_search(client, args.searches)
+
+        asks = [
+            asyncio.create_task(client.get("/api/v1/ask", params={"question": f"question {i}"}))
+            for i in range(args.asks)
+        ]
+        await asyncio.sleep(0.05)  # let the asks reach the LLM call
+        loaded = await measure_search(client, args.searches)
+        in_flight = sum(1 for task in asks if not task.done())
+        responses = await asyncio.gather(*asks)
+
+    failed_asks = sum(1 for r in responses if r.status_code != 200)
+    idle_p95, loaded_p95 = percentile(idle, 95), percentile(loaded, 95)
+    print(f"/search idle:   p50={statistics.median(idle):7.1f}ms p95={idle_p95:7.1f}ms")
+    print(f"/search loaded: p50={statistics.median(loaded):7.1f}ms p95={loaded_p95:7.1f}ms "
+          f"({in_flight}/{args.asks} /ask calls still in flight after the run, {failed_asks} failed)")
+
+    limit = idle_p95 * args.max_slowdown + 25
+    if loaded_p95 > limit:
+        print(f"FAIL: loaded p95 {loaded_p95:.1f}ms exceeds {limit:.1f}ms")
+        return 1
+    print("PASS")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--asks", type=int, default=20)
+    parser.add_argument("--searches", type=int, default=50)
+    parser.add_argument("--llm-delay", type=float, default=2.0)
+    parser.add_argument("--max-slowdown", type=float, default=3.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-concurrency-")
+    os.chdir(workdir)
+    os.makedirs("data", exist_ok=True)
+    # Always write to the scratch directory, never to a configured database or index
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'data', 'documents.db')}"
+    os.environ["CHROMA_DIR"] = os.path.join(workdir, "data", "chroma")
+    os.environ.setdefault("GEMINI_API_KEY", "offline")
+    os.environ["EMBEDDING_BACKEND"] = "hashing"
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["LLM_STUB_DELAY"] = str(args.llm_delay)
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
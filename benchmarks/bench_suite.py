@@ -0,0 +1,343 @@
+"""
+Offline benchmark suite for ingestion, search and question answering.
+
+Usage:
+    python -m benchmarks.bench_suite --output results.json
+    python -m benchmarks.bench_suite --sizes 1,20 --queries 50 --compare baseline.json
+
+Runs the FastAPI app in-process against a temporary database with the
+hashing embedder and the stub LLM backend, so results exclude provider
+latency and need no network. A corpus of text, image and PDF documents is
+generated at each --sizes page count (images are single-page and need
+tesseract; they are skipped when it is missing).
+
+Measured:
+    ingestion     POST /upload of the whole corpus until every job finishes:
+                  files/s, pages/s and chunks/s
+    latency       p50/p95/p99 of search_similar_chunks, answer_question,
+                  GET /search and GET /ask, with the query cache disabled
+    memory        tracemalloc peak per phase and the process peak RSS
+
+Results are written as JSON. With --compare, each latency percentile and
+throughput figure is compared with a previous results file and the run
+fails if any regresses by more than --max-regression percent.
+"""
+from typing import Any, Callable, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+WORDS = (
+    "invoice payment contract clause warranty delivery liability termination renewal "
+    "supplier customer schedule amount currency notice breach remedy audit compliance"
+).split()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies_ms: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(latencies_ms),
+        "mean_ms": sum(latencies_ms) / len(latencies_ms),
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+    }
+
+
+def paragraph(doc: int, page: int, para: int) -> str:
+    # Deterministic filler so runs are comparable between commits
+    words = [WORDS[(doc * 7 + page * 5 + para * 3 + i) % len(WORDS)] for i in range(40)]
+    return f"Document {doc} page {page} paragraph {para}: " + " ".join(words) + "."
+
+
+def page_text(doc: int, page: int, paragraphs: int = 6) -> str:
+    return "\n\n".join(paragraph(doc, page, para) for para in range(1, paragraphs + 1))
+
+
+def generate_corpus(directory: str, sizes: List[int], docs_per_size: int, with_images: bool) -> List[str]:
+    """Write text and PDF documents at each page count, plus single-page images."""
+    import fitz
+    from PIL import Image, ImageDraw
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    doc = 0
+    for pages in sizes:
+        for _ in range(docs_per_size):
+            doc += 1
+            path = os.path.join(directory, f"text_{pages}p_{doc}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                # Text documents are always a single page; size scales their length
+                f.write("\n\n".join(page_text(doc, page) for page in range(1, pages + 1)))
+            paths.append(path)
+
+            doc += 1
+            pdf = fitz.open()
+            for page in range(1, pages + 1):
+                pdf.new_page().insert_textbox(fitz.Rect(50, 50, 550, 800), page_text(doc, page), fontsize=9)
+            path = os.path.join(directory, f"pdf_{pages}p_{doc}.pdf")
+            pdf.save(path)
+            pdf.close()
+            paths.append(path)
+
+    if with_images:
+        for _ in range(docs_per_size):
+            doc += 1
+            image = Image.new("RGB", (1200, 400), "white")
+            ImageDraw.Draw(image).multiline_text((20, 20), paragraph(doc, 1, 1).replace(": ", ":\n"), fill="black")
+            path = os.path.join(directory, f"image_{doc}.png")
+            image.save(path)
+            paths.append(path)
+    return paths
+
+
+def measure(fn: Callable[[int], Any], count: int) -> List[float]:
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def traced(results: Dict[str, Any], phase: str, enabled: bool, fn: Callable[[], Any]) -> Any:
+    """Run fn, recording its tracemalloc peak under results["memory"][phase]."""
+    if not enabled:
+        return fn()
+    tracemalloc.start()
+    try:
+        return fn()
+    finally:
+        results["memory"][f"{phase}_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+
+def run_ingestion(client, paths: List[str], timeout: float) -> Dict[str, Any]:
+    from app.services.vector_store import get_collection
+
+    start = time.perf_counter()
+    jobs = []
+    for path in paths:
+        with open(path, "rb") as f:
+            response = client.post("/api/v1/upload", files={"file": (os.path.basename(path), f)})
+        response.raise_for_status()
+        jobs.append(response.json()["job_id"])
+
+    pending, failed, documents = set(jobs), [], []
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        for job_id in list(pending):
+            job = client.get(f"/api/v1/jobs/{job_id}").json()
+            if job["status"] == "completed":
+                documents.append(job["document_id"])
+                pending.discard(job_id)
+            elif job["status"] == "failed":
+                failed.append({"job_id": job_id, "filename": job["filename"], "error": job["error"]})
+                pending.discard(job_id)
+        if pending:
+            time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    pages = sum(
+        client.get(f"/api/v1/documents/{doc_id}", params={"fields": "page_count"}).json()["page_count"]
+        for doc_id in documents
+    )
+    chunks = get_collection().count()
+    return {
+        "files": len(paths),
+        "completed": len(documents),
+        "failed": failed,
+        "timed_out": len(pending),
+        "pages": pages,
+        "chunks": chunks,
+        "elapsed_seconds": elapsed,
+        "files_per_second": len(documents) / elapsed,
+        "pages_per_second": pages / elapsed,
+        "chunks_per_second": chunks / elapsed,
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+    from app.core.config import settings
+    from app.main import app
+    from app.services.qa_service import answer_question
+    from app.services.vector_store import search_similar_chunks
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    tesseract = settings.TESSERACT_CMD or shutil.which("tesseract")
+    results: Dict[str, Any] = {
+        "meta": {
+            "commit": args.commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "docs_per_size": args.docs_per_size,
+            "queries": args.queries,
+            "k": args.k,
+            "embedding_backend": settings.EMBEDDING_BACKEND,
+            "llm_backend": settings.LLM_BACKEND,
+            "llm_stub_delay": settings.LLM_STUB_DELAY,
+            "trace_memory": args.trace_memory,
+            "skipped": [] if tesseract or not args.images else ["image documents: tesseract not found"],
+        },
+        "memory": {},
+    }
+
+    paths = generate_corpus("corpus", sizes, args.docs_per_size, args.images and bool(tesseract))
+    queries = [f"{WORDS[i % len(WORDS)]} {WORDS[(i * 3 + 1) % len(WORDS)]} terms {i}" for i in range(args.queries)]
+
+    with TestClient(app) as client:
+        results["ingestion"] = traced(
+            results, "ingestion", args.trace_memory, lambda: run_ingestion(client, paths, args.ingest_timeout)
+        )
+
+        latency = {}
+        latency["search_similar_chunks"] = summarize(traced(
+            results, "search", args.trace_memory,
+            lambda: measure(lambda i: search_similar_chunks(queries[i], args.k), args.queries)
+        ))
+        latency["answer_question"] = summarize(traced(
+            results, "ask", args.trace_memory,
+            lambda: measure(lambda i: asyncio.run(answer_question(queries[i], args.k)), args.queries)
+        ))
+        latency["http_search"] = summarize(measure(
+            lambda i: client.get("/api/v1/search", params={"query": queries[i], "k": args.k}).raise_for_status(),
+            args.queries
+        ))
+        latency["http_ask"] = summarize(measure(
+            lambda i: client.get("/api/v1/ask", params={"question": queries[i], "k": args.k}).raise_for_status(),
+            args.queries
+        ))
+        results["latency"] = latency
+
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["memory"]["max_rss_bytes"] = max_rss if sys.platform == "darwin" else max_rss * 1024
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Return a line per compared metric; lines for regressions start with REGRESSION."""
+    lines = []
+    for key in ("sizes", "docs_per_size", "queries", "llm_stub_delay", "trace_memory"):
+        if baseline.get("meta", {}).get(key) != results["meta"][key]:
+            # tracemalloc alone slows the traced phases several times over
+            lines.append(f"warning: {key} differs from the baseline; timings are not comparable")
+    metrics = [
+        (("ingestion", key), True) for key in ("files_per_second", "pages_per_second", "chunks_per_second")
+    ] + [
+        (("latency", name, key), False)
+        for name in results["latency"]
+        for key in ("p50_ms", "p95_ms", "p99_ms")
+    ]
+    for path, higher_is_better in metrics:
+        try:
+            old, new = baseline, results
+            for key in path:
+                old, new = old[key], new[key]
+        except KeyError:
+            continue
+        if not old:
+            continue
+        change = (new - old) / old * 100
+        worse = -change if higher_is_better else change
+        label = "REGRESSION" if worse > max_regression else "ok"
+        lines.append(f"{label:<11}{'.'.join(path):<40}{old:>12.2f} -> {new:>12.2f} ({change:+.1f}%)")
+    return lines
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1,10,50", help="Comma-separated document sizes in pages")
+    parser.add_argument("--docs-per-size", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=100, help="Calls per latency measurement")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="Seconds each stub LLM call takes")
+    parser.add_argument("--no-images", dest="images", action="store_false", help="Skip image documents")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false",
+                        help="Skip tracemalloc, which slows the traced phases down")
+    parser.add_argument("--ingest-timeout", type=float, default=600.0)
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+    args.commit = git_commit()
+
+    # Resolve paths before moving into the scratch directory
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    workdir = tempfile.mkdtemp(prefix="bench-suite-")
+    os.chdir(workdir)
+    os.makedirs("data", exist_ok=True)
+    # Always write to the scratch directory, never to a configured database
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'data', 'documents.db')}"
+    os.environ.setdefault("GEMINI_API_KEY", "offline")
+    os.environ["EMBEDDING_BACKEND"] = "hashing"
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["LLM_STUB_DELAY"] = str(args.llm_delay)
+    os.environ["QUERY_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("INGESTION_MAX_QUEUE_DEPTH", "100000")
+    os.environ["CHROMA_DIR"] = os.path.join(workdir, "data", "chroma")
+
+    results = run(args)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    ingestion = results["ingestion"]
+    print(f"ingestion: {ingestion['completed']}/{ingestion['files']} files, {ingestion['pages']} pages, "
+          f"{ingestion['chunks']} chunks in {ingestion['elapsed_seconds']:.1f}s "
+          f"({ingestion['files_per_second']:.2f} files/s, {ingestion['pages_per_second']:.1f} pages/s, "
+          f"{ingestion['chunks_per_second']:.1f} chunks/s)")
+    for name, stats in results["latency"].items():
+        print(f"{name:<24} p50={stats['p50_ms']:8.2f}ms p95={stats['p95_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms")
+    for name, value in results["memory"].items():
+        print(f"{name:<24} {value / 2**20:8.1f} MiB")
+    for skipped in results["meta"]["skipped"]:
+        print(f"skipped: {skipped}")
+    print(f"Results written to {output}")
+
+    status = 0
+    if ingestion["failed"] or ingestion["timed_out"]:
+        print(f"FAIL: {len(ingestion['failed'])} ingestion jobs failed, {ingestion['timed_out']} timed out")
+        status = 1
+    if baseline is not None:
+        lines = compare(results, baseline, args.max_regression)
+        print("\n".join(lines))
+        if any(line.startswith("REGRESSION") for line in lines):
+            status = 1
+    shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
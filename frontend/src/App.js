@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { BrowserRouter as Router, Routes, Route, Link } from 'react-router-dom';
 import { HomeIcon, DocumentIcon, MagnifyingGlassIcon, QuestionMarkCircleIcon } from '@heroicons/react/24/outline';
-import { uploadDocument, searchDocuments, askQuestion, deleteDocument, getDocumentDetails } from './services/api';
+import { uploadDocument, waitForJob, searchDocuments, askQuestion, deleteDocument, getDocumentDetails } from './services/api';
 import api from './services/api';
 
 function App() {
@@ -85,12 +85,9 @@ function Home() {
 
   const fetchRecentDocuments = async () => {
     try {
-      const response = await api.get('/documents');
-      // Sort by created_at and take the 5 most recent
-      const sorted = response.data.sort((a, b) => 
-        new Date(b.created_at) - new Date(a.created_at)
-      );
-      setRecentDocuments(sorted.slice(0, 5));
+      // Newest first, so the first page holds the 5 most recent
+      const response = await api.get('/documents', { params: { order: 'desc', limit: 5 } });
+      setRecentDocuments(response.data);
     } catch (err) {
       setError('Failed to fetch recent documents');
     } finally {
@@ -117,8 +114,12 @@ function Home() {
 
     setUploading(true);
     try {
-      await uploadDocument(file);
+      const result = await uploadDocument(file);
       setFile(null);
+      // Uploads are processed in the background; wait for the job before refreshing
+      if (result.job_id) {
+        await waitForJob(result.job_id);
+      }
       fetchRecentDocuments(); // Refresh the recent documents list
     } catch (err) {
       setError(err.message);
@@ -323,8 +324,15 @@ function Documents() {
 
   const fetchDocuments = async () => {
     try {
-      const response = await api.get('/documents');
-      setDocuments(response.data);
+      // Follow X-Next-Cursor until every page of the listing is loaded
+      let all = [];
+      let cursor = null;
+      do {
+        const response = await api.get('/documents', { params: cursor ? { cursor } : {} });
+        all = all.concat(response.data);
+        cursor = response.headers['x-next-cursor'];
+      } while (cursor);
+      setDocuments(all);
     } catch (err) {
       setError('Failed to fetch documents');
     } finally {
@@ -346,8 +354,12 @@ function Documents() {
     setError(null);
 
     try {
-      await uploadDocument(file);
+      const result = await uploadDocument(file);
       setFile(null);
+      // Uploads are processed in the background; wait for the job before refreshing
+      if (result.job_id) {
+        await waitForJob(result.job_id);
+      }
       fetchDocuments(); // Refresh the document list
     } catch (err) {
       setError(err.message);
@@ -25,6 +25,28 @@ export const uploadDocument = async (file) => {
   }
 };
 
+// Poll an ingestion job until it completes; rejects with the job's error if it fails
+export const waitForJob = async (jobId, { interval = 1000, timeout = 10 * 60 * 1000 } = {}) => {
+  const deadline = Date.now() + timeout;
+  while (Date.now() < deadline) {
+    let job;
+    try {
+      const response = await api.get(`/jobs/${jobId}`);
+      job = response.data;
+    } catch (error) {
+      throw new Error(error.response?.data?.detail || 'Error checking processing status');
+    }
+    if (job.status === 'completed') {
+      return job;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Document processing failed');
+    }
+    await new Promise((resolve) => setTimeout(resolve, interval));
+  }
+  throw new Error('Document is still processing; refresh later to see it');
+};
+
 export const searchDocuments = async (query) => {
   try {
     const response = await api.get('/search', {